@@ -0,0 +1,99 @@
+"""
+Micro-benchmark of the itinerary NDJSON parsing, replaying a synthetic token stream through the old
+split-the-whole-buffer loop and through ItineraryLineParser.
+
+Run from the repository root:
+    python -m benchmarks.bench_ndjson_parser [--items 50 200 800] [--token-sizes 4 64 256]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+from utils.ndjson_parser import ItineraryLineParser
+
+
+def synthetic_stream(item_count, token_size):
+    start = datetime(2025, 7, 15, 8, 0)
+    lines = []
+    for i in range(item_count):
+        lines.append(json.dumps({
+            "activity_name": f"Activity number {i} with a reasonably long descriptive name",
+            "activity_type": ["rest", "adventure", "tourist attraction", "commute"][i % 4],
+            "start_time": (start + timedelta(minutes=45 * i)).isoformat(),
+            "end_time": (start + timedelta(minutes=45 * i + 40)).isoformat(),
+            "activity_id": f"id-{i}",
+        }))
+    text = "\n".join(lines) + "\n"
+    return [text[i:i + token_size] for i in range(0, len(text), token_size)]
+
+
+def legacy_parse(chunks):
+    """The loop generate_sse_stream used before ItineraryLineParser, returning (chunk index, item) pairs."""
+    emitted = []
+    full_response = ""
+    for index, chunk in enumerate(chunks):
+        full_response += chunk
+        lines = full_response.split('\n')
+        for i, line in enumerate(lines[:-1]):
+            line = line.strip()
+            if line and line.startswith('{') and line.endswith('}'):
+                try:
+                    item_data = json.loads(line)
+                    if all(key in item_data for key in ['activity_name', 'activity_type', 'start_time', 'end_time', 'activity_id']):
+                        emitted.append((index, item_data))
+                        full_response = '\n'.join(lines[i + 1:])
+                        break
+                except json.JSONDecodeError:
+                    continue
+    return emitted
+
+
+def incremental_parse(chunks):
+    emitted = []
+    parser = ItineraryLineParser()
+    for index, chunk in enumerate(chunks):
+        emitted.extend((index, item) for item in parser.feed(chunk))
+    emitted.extend((len(chunks), item) for item in parser.close())
+    return emitted
+
+
+def newline_positions(chunks):
+    """Index of the chunk that completes each line, the earliest point an item could be emitted."""
+    return [index for index, chunk in enumerate(chunks) for _ in range(chunk.count("\n"))]
+
+
+def measure(parse, chunks, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        emitted = parse(chunks)
+        best = min(best, time.perf_counter() - started)
+    ready = newline_positions(chunks)
+    lag = [index - ready[n] for n, (index, _) in enumerate(emitted)]
+    return best, len(emitted), max(lag, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--token-sizes", type=int, nargs="+", default=[4, 64, 256],
+                        help="characters per streamed chunk, larger chunks often complete several lines at once")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'items':>6} {'chunk':>5} {'chunks':>7} | {'legacy ms':>10} {'emitted':>7} {'max lag':>7} | {'incremental ms':>14} {'emitted':>7} {'max lag':>7}")
+    for token_size in args.token_sizes:
+        for item_count in args.items:
+            chunks = synthetic_stream(item_count, token_size)
+            legacy = measure(legacy_parse, chunks, args.repeat)
+            incremental = measure(incremental_parse, chunks, args.repeat)
+            print(
+                f"{item_count:>6} {token_size:>5} {len(chunks):>7} | {legacy[0] * 1000:>10.2f} {legacy[1]:>7} {legacy[2]:>7} |"
+                f" {incremental[0] * 1000:>14.2f} {incremental[1]:>7} {incremental[2]:>7}"
+            )
+    print("max lag: chunks between a line's newline arriving and its item being emitted")
+
+
+if __name__ == "__main__":
+    main()
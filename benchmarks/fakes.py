@@ -0,0 +1,195 @@
+"""
+Offline stand-ins for the two external services the API depends on.
+
+- FakeChatOpenAI replaces langchain's ChatOpenAI: it streams a well-formed NDJSON itinerary token by token with
+  a configurable per-token delay and jitter, and answers structured-output calls after a fixed latency.
+- spring_app is a stub of the Spring service's `/activities` endpoint serving synthetic activity lists.
+  The list size comes from the userId: `bench-120-7` gets 120 activities, anything else gets DEFAULT_ACTIVITY_COUNT.
+
+The Spring stub can also run on its own for a live server:
+    uvicorn benchmarks.fakes:spring_app --port 9000
+"""
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import random
+import re
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from models.ActivityModels import CategoryList, CategoryListBatch, CategoryType
+from models.ItineraryModels import Itinerary, ItineraryItem
+from utils import llm_gateway
+from utils.activity_formatter import COMPACT_COLUMNS, COMPACT_LEGEND
+
+DEFAULT_ACTIVITY_COUNT = 10
+MIN_ACTIVITY_COUNT = 5
+MAX_ACTIVITY_COUNT = 500
+
+# Synthetic activities are scattered within roughly 15 km of central Delhi
+CENTER_LATITUDE = 28.6139
+CENTER_LONGITUDE = 77.2090
+SPREAD_DEGREES = 0.14
+
+ACTIVITY_KINDS = [
+    ("Heritage walk through", "A guided walk through the historic lanes and monuments of"),
+    ("Street food tour in", "Tasting the local street food and snacks of"),
+    ("Sunrise trek near", "A physically demanding early morning trek with panoramic views near"),
+    ("Museum visit in", "An unhurried visit to the museum and galleries of"),
+    ("Temple visit in", "A visit to the temple and its evening prayer ceremony in"),
+    ("Market shopping in", "Browsing handicrafts, spices and textiles in the bazaar of"),
+]
+NEIGHBOURHOODS = ["Chandni Chowk", "Hauz Khas", "Lodhi Colony", "Connaught Place", "Mehrauli", "Paharganj", "Karol Bagh",
+                  "Saket", "Nizamuddin", "Shahpur Jat", "Majnu ka Tilla", "Dilli Haat"]
+
+
+class FakeLLMConfig:
+    """Latency model of the fake LLM, all values in milliseconds."""
+
+    def __init__(self, first_token_ms=400.0, token_delay_ms=2.0, jitter_ms=1.0, chars_per_token=4, structured_ms=600.0, seed=None):
+        self.first_token_ms = first_token_ms
+        self.token_delay_ms = token_delay_ms
+        self.jitter_ms = jitter_ms
+        self.chars_per_token = chars_per_token
+        self.structured_ms = structured_ms
+        self.random = random.Random(seed)
+
+    def delay(self, base_ms):
+        return max(base_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms), 0.0) / 1000
+
+
+def activity_count_for(user_id):
+    match = re.match(r"bench-(\d+)", user_id)
+    count = int(match.group(1)) if match else DEFAULT_ACTIVITY_COUNT
+    return min(max(count, MIN_ACTIVITY_COUNT), MAX_ACTIVITY_COUNT)
+
+
+def synthetic_activities(count, seed):
+    rng = random.Random(seed)
+    activities = []
+    for i in range(count):
+        kind, description = rng.choice(ACTIVITY_KINDS)
+        neighbourhood = rng.choice(NEIGHBOURHOODS)
+        activities.append({
+            "id": 10_000 + i,
+            "name": f"{kind} {neighbourhood} #{i + 1}",
+            "description": f"{description} {neighbourhood}.",
+            "duration": rng.choice([45, 60, 90, 120, 150]),
+            "latitude": round(CENTER_LATITUDE + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES), 6),
+            "longitude": round(CENTER_LONGITUDE + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES), 6),
+        })
+    return activities
+
+
+spring_app = FastAPI()
+
+
+@spring_app.get("/activities")
+async def get_activities(userId: str, request: Request):
+    data = synthetic_activities(activity_count_for(userId), seed=userId)
+    etag = '"' + hashlib.sha1(json.dumps(data).encode()).hexdigest() + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse({"data": data}, headers={"ETag": etag})
+
+
+_ACTIVITY_ID = re.compile(r"activity_id:([^)\s,]+)")
+_DAY_DATE = re.compile(r"start at 8:00 AM on ([A-Z][a-z]+ \d{2}, \d{4})")
+
+
+def _compact_ids(prompt):
+    """Local ids from the CSV table of a compact prompt, see utils.activity_formatter."""
+    if COMPACT_LEGEND not in prompt:
+        return []
+    rows = csv.reader(io.StringIO(prompt.split(COMPACT_LEGEND, 1)[1].strip()))
+    next(rows, None)
+    activity_ids = []
+    for row in rows:
+        if len(row) != len(COMPACT_COLUMNS):
+            break
+        activity_ids.append(row[0].strip())
+    return activity_ids
+
+
+def fake_itinerary_lines(prompt):
+    """
+    NDJSON itinerary covering every activity id found in the prompt, real activities only with travel time left between them.
+    A prompt for a single day keeps everything on the date it names, otherwise a new day starts every 5 activities.
+    """
+    activity_ids = _ACTIVITY_ID.findall(prompt) or _compact_ids(prompt) or [str(i + 1) for i in range(prompt.count("Activity Name:"))]
+    day = _DAY_DATE.search(prompt)
+    clock = datetime.strptime(day.group(1), "%B %d, %Y").replace(hour=8) if day else datetime(2025, 7, 15, 8, 0)
+    lines = []
+    for position, activity_id in enumerate(activity_ids):
+        if position and position % 5 == 0 and day is None:
+            clock = datetime.combine(clock.date() + timedelta(days=1), datetime.min.time()).replace(hour=8)
+        elif position:
+            clock += timedelta(minutes=20)
+        lines.append({"activity_name": f"Activity {activity_id}", "activity_type": "tourist attraction",
+                      "start_time": clock.isoformat(), "end_time": (clock + timedelta(minutes=90)).isoformat(),
+                      "activity_id": activity_id})
+        clock += timedelta(minutes=90)
+    return "".join(json.dumps(line) + "\n" for line in lines)
+
+
+def _structured_answer(schema, prompt):
+    if schema is CategoryList:
+        return CategoryList(category_list=[CategoryType(category_type="Sightseeing"), CategoryType(category_type="Cultural")])
+    if schema is CategoryListBatch:
+        count = len(re.findall(r"^\s*\d+\. ", prompt, flags=re.MULTILINE)) or 1
+        return CategoryListBatch(results=[_structured_answer(CategoryList, prompt)] * count)
+    if schema is Itinerary:
+        items = [json.loads(line) for line in fake_itinerary_lines(prompt).splitlines()]
+        return Itinerary(items=[ItineraryItem(**{k: v for k, v in item.items() if k != "activity_id"}) for item in items])
+    raise ValueError(f"FakeChatOpenAI has no canned answer for {schema.__name__}")
+
+
+class _FakeStructuredModel:
+    def __init__(self, schema, config):
+        self.schema = schema
+        self.config = config
+
+    def invoke(self, messages, *args, **kwargs):
+        time.sleep(self.config.delay(self.config.structured_ms))
+        return _structured_answer(self.schema, messages[-1].content)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        await asyncio.sleep(self.config.delay(self.config.structured_ms))
+        return _structured_answer(self.schema, messages[-1].content)
+
+
+class FakeChatOpenAI:
+    """Drop-in for ChatOpenAI in benchmarks, the latency model is shared through the class-level config."""
+
+    config = FakeLLMConfig()
+
+    def __init__(self, *args, **kwargs):
+        self.kwargs = kwargs
+
+    async def astream(self, messages, *args, **kwargs):
+        text = fake_itinerary_lines(messages[-1].content)
+        size = self.config.chars_per_token
+        await asyncio.sleep(self.config.delay(self.config.first_token_ms))
+        for start in range(0, len(text), size):
+            yield SimpleNamespace(content=text[start:start + size])
+            await asyncio.sleep(self.config.delay(self.config.token_delay_ms))
+
+    def with_structured_output(self, schema=None, **kwargs):
+        return _FakeStructuredModel(schema, self.config)
+
+
+def install_fakes(main_module, config=None):
+    """
+    Points the API's LLM gateway at the fake LLM, so calls still go through its admission control.
+    The Spring stub is wired separately through spring_client.start_client.
+    """
+    if config is not None:
+        FakeChatOpenAI.config = config
+    llm_gateway.ChatOpenAI = FakeChatOpenAI
+    main_module.llm_gateway.reset_models()
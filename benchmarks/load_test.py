@@ -0,0 +1,286 @@
+"""
+Offline load test of the API's endpoints against the fake LLM and fake Spring service in benchmarks/fakes.py.
+
+By default the app is served by a single uvicorn worker on a background thread of this process (see
+benchmarks/serve.py), so nothing outside localhost and no API key is needed. Pass --url to drive a server
+running elsewhere instead, e.g. one started with `python -m benchmarks.serve`.
+
+Examples, run from the repository root:
+    python -m benchmarks.load_test --activities 5 50 500 --concurrency 1 8 32
+    python -m benchmarks.load_test --save-baseline benchmarks/baselines/local.json
+    python -m benchmarks.load_test --compare benchmarks/baselines/local.json --tolerance 0.2
+    python -m benchmarks.load_test --find-max-streams --slo-ms 3000
+
+Reported per scenario: time to first event, time to first item, inter-item gap, stream duration
+(p50/p95/p99/max), items/sec and errors. --find-max-streams doubles the number of concurrent streams until
+p95 time-to-first-item breaks the SLO and reports the largest level that held it.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+
+import httpx
+import numpy as np
+
+from benchmarks.fakes import FakeLLMConfig
+from benchmarks.serve import build_server
+
+RECOMMENDATION_DESCRIPTIONS = [
+    "beaches, street food, some temples",
+    "Something memorable for our anniversary",
+    "trekking in the mountains and rafting",
+    "A slow week with my parents, nothing too tiring",
+    "museums, heritage walks and old forts",
+    "We want to see how locals actually live, surprise us",
+]
+
+# Metrics where a higher value is better, everything else is a latency
+HIGHER_IS_BETTER = ("items_per_second", "requests_per_second", "max_concurrent_streams")
+
+_run_ids = itertools.count()
+
+
+def unique_description(run, i):
+    """
+    A sample description made unique to this run and request, so the recommendation cache never answers it.
+    The tag is long enough to rule out near-duplicate hits too, and digits only, which the local classifier ignores.
+    """
+    description = RECOMMENDATION_DESCRIPTIONS[i % len(RECOMMENDATION_DESCRIPTIONS)]
+    return f"{description} ({run}-{i}-{uuid.uuid4().int})"
+
+
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    array = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(array, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2), "max": round(float(array.max()), 2)}
+
+
+def start_local_server(config):
+    """Serves the API on a free localhost port from a background thread, returning its base URL."""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = build_server("127.0.0.1", port, config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", server
+
+
+async def run_stream(client, user_id):
+    started = time.perf_counter()
+    first_event = None
+    item_times = []
+    error = None
+    try:
+        async with client.stream("GET", f"/stream-itinerary-sse/{user_id}") as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                now = time.perf_counter() - started
+                event = json.loads(line[len("data: "):])
+                if first_event is None:
+                    first_event = now
+                if event["type"] == "item":
+                    item_times.append(now)
+                elif event["type"] == "error":
+                    error = event.get("message", "error")
+    except httpx.HTTPError as e:
+        error = str(e)
+    return {
+        "first_event": first_event,
+        "first_item": item_times[0] if item_times else None,
+        "gaps": list(np.diff(item_times)) if len(item_times) > 1 else [],
+        "items": len(item_times),
+        "duration": time.perf_counter() - started,
+        "error": error,
+    }
+
+
+async def stream_scenario(client, activity_count, concurrency, requests):
+    run = next(_run_ids)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            # Unique users give unique activity sets, so the itinerary cache never short-circuits the LLM
+            return await run_stream(client, f"bench-{activity_count}-{run}-{i}")
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+    ok = [result for result in results if result["error"] is None]
+    return {
+        "scenario": f"sse/{activity_count}-activities/c{concurrency}",
+        "requests": requests,
+        "errors": len(results) - len(ok),
+        "time_to_first_event_ms": percentiles([r["first_event"] for r in ok if r["first_event"] is not None]),
+        "time_to_first_item_ms": percentiles([r["first_item"] for r in ok if r["first_item"] is not None]),
+        "inter_item_gap_ms": percentiles([gap for r in ok for gap in r["gaps"]]),
+        "stream_duration_ms": percentiles([r["duration"] for r in ok]),
+        "items_per_second": round(sum(r["items"] for r in ok) / wall, 2),
+    }
+
+
+async def request_scenario(client, name, send, concurrency, requests):
+    semaphore = asyncio.Semaphore(concurrency)
+    sources = {}
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await send(i)
+            elapsed = time.perf_counter() - started
+            if response.status_code != 200:
+                return None
+            source = response.json().get("source")
+            if source:
+                sources[source] = sources.get(source, 0) + 1
+            return elapsed
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - started
+    ok = [latency for latency in latencies if latency is not None]
+    result = {
+        "scenario": f"{name}/c{concurrency}",
+        "requests": requests,
+        "errors": len(latencies) - len(ok),
+        "latency_ms": percentiles(ok),
+        "requests_per_second": round(len(ok) / wall, 2),
+    }
+    if sources:
+        result["sources"] = sources
+    return result
+
+
+async def find_max_streams(client, activity_count, slo_ms, limit):
+    best = 0
+    concurrency = 1
+    while concurrency <= limit:
+        result = await stream_scenario(client, activity_count, concurrency, concurrency)
+        p95 = result["time_to_first_item_ms"]["p95"]
+        print(f"  {concurrency:>4} concurrent streams: p95 time to first item {p95} ms, errors {result['errors']}", file=sys.stderr)
+        if result["errors"] or p95 is None or p95 > slo_ms:
+            break
+        best = concurrency
+        concurrency *= 2
+    return {"scenario": f"capacity/{activity_count}-activities/slo-{slo_ms:g}ms", "max_concurrent_streams": best}
+
+
+def flatten(result):
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict) and key != "sources":
+            for sub_key, sub_value in value.items():
+                flat[f"{key}.{sub_key}"] = sub_value
+        elif isinstance(value, (int, float)) and key not in ("requests", "errors"):
+            flat[key] = value
+    return flat
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of the current results against a saved baseline, beyond the relative tolerance."""
+    previous = {result["scenario"]: flatten(result) for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(result["scenario"])
+        if old is None:
+            continue
+        for metric, value in flatten(result).items():
+            before = old.get(metric)
+            if value is None or not before:
+                continue
+            if metric.startswith(HIGHER_IS_BETTER):
+                regressed = value < before * (1 - tolerance)
+            else:
+                regressed = value > before * (1 + tolerance)
+            if regressed:
+                regressions.append(f"{result['scenario']} {metric}: {before} -> {value}")
+    return regressions
+
+
+async def run(args):
+    config = FakeLLMConfig(first_token_ms=args.first_token_ms, token_delay_ms=args.token_delay_ms, jitter_ms=args.jitter_ms,
+                           chars_per_token=args.chars_per_token, structured_ms=args.structured_ms, seed=args.seed)
+    url, server = args.url, None
+    if not url:
+        url, server = start_local_server(config)
+
+    client = httpx.AsyncClient(base_url=url, timeout=None, limits=httpx.Limits(max_connections=None))
+    results = []
+    async with client:
+        for activity_count, concurrency in itertools.product(args.activities, args.concurrency):
+            results.append(await stream_scenario(client, activity_count, concurrency, max(args.requests, concurrency)))
+            print(json.dumps(results[-1]), file=sys.stderr)
+
+        for concurrency in args.concurrency:
+            run_id = next(_run_ids)
+            results.append(await request_scenario(
+                client, "recommendations",
+                lambda i: client.post("/get-recommendations", json={"description": unique_description(run_id, i)}),
+                concurrency, max(args.requests, concurrency),
+            ))
+            print(json.dumps(results[-1]), file=sys.stderr)
+
+        results.append(await request_scenario(client, "sample-response", lambda i: client.get("/sample-response"), 1, 3))
+        print(json.dumps(results[-1]), file=sys.stderr)
+
+        if args.find_max_streams:
+            results.append(await find_max_streams(client, args.capacity_activities, args.slo_ms, args.max_streams))
+            print(json.dumps(results[-1]), file=sys.stderr)
+
+    if server is not None:
+        server.should_exit = True
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running server, instead of the in-process app")
+    parser.add_argument("--activities", type=int, nargs="+", default=[5, 50, 200])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--requests", type=int, default=8, help="requests per scenario (at least the concurrency)")
+    parser.add_argument("--first-token-ms", type=float, default=400.0)
+    parser.add_argument("--token-delay-ms", type=float, default=2.0)
+    parser.add_argument("--jitter-ms", type=float, default=1.0)
+    parser.add_argument("--chars-per-token", type=int, default=4)
+    parser.add_argument("--structured-ms", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--find-max-streams", action="store_true")
+    parser.add_argument("--capacity-activities", type=int, default=20)
+    parser.add_argument("--slo-ms", type=float, default=3000.0, help="p95 time-to-first-item budget for --find-max-streams")
+    parser.add_argument("--max-streams", type=int, default=1024)
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to check for regressions, exits 1 on any")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report = {"created_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "args": vars(args), "results": results}
+    print(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Runs the real API as a single worker with the fake LLM, and mounts the Spring stub under /fake-spring,
+so `benchmarks.load_test --url` can measure a live server without OpenAI or the Spring backend:
+    python -m benchmarks.serve --port 8000
+    python -m benchmarks.load_test --url http://127.0.0.1:8000
+"""
+import argparse
+import os
+
+import uvicorn
+
+from benchmarks.fakes import FakeLLMConfig, install_fakes, spring_app
+
+
+def build_server(host, port, config=None):
+    """A single-worker uvicorn server for the API, wired to the fake LLM and the mounted Spring stub."""
+    os.environ["SPRING_API_URL"] = f"http://{host}:{port}/fake-spring"
+    import main as api
+
+    install_fakes(api, config)
+    if not any(getattr(route, "path", None) == "/fake-spring" for route in api.app.routes):
+        api.app.mount("/fake-spring", spring_app)
+    return uvicorn.Server(uvicorn.Config(api.app, host=host, port=port, workers=1, log_level="warning"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--first-token-ms", type=float, default=400.0)
+    parser.add_argument("--token-delay-ms", type=float, default=2.0)
+    parser.add_argument("--jitter-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    config = FakeLLMConfig(first_token_ms=args.first_token_ms, token_delay_ms=args.token_delay_ms, jitter_ms=args.jitter_ms)
+    build_server(args.host, args.port, config).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,63 @@
-from fastapi import FastAPI,HTTPException
+from fastapi import FastAPI,HTTPException,Response,Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from langchain_openai import ChatOpenAI
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
 from langchain_core.messages import SystemMessage, HumanMessage
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel
+import asyncio
+import hmac
 import json
 import os
-import httpx
-from typing import AsyncGenerator
+import time
+from datetime import timedelta
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncGenerator, List, Literal, Optional
 
 from models.ItineraryModels import Itinerary, ItineraryItem
-from models.ActivityModels import CategoryList
-from utils.activity_formatter import format_activity
+from models.ActivityModels import CategoryType
+from utils.activity_formatter import encode_activities, PROMPT_ENCODING
+from utils.tokenizer import count_tokens, load_tokenizer_in_background, tokenizer_name
+from utils.route_solver import plan_route, build_local_itinerary, format_route_hint, TRIP_START
+from utils.day_clustering import cluster_days
+from utils.gap_filler import GapFiller
+from utils.spring_client import fetch_activities, start_client, close_client, activity_cache
+from utils.recommendation_batcher import RecommendationBatcher
+from utils.category_classifier import classify_description, CATEGORY_CONFIDENCE_THRESHOLD
+from utils.recommendation_cache import RecommendationCache
+from utils.itinerary_cache import ItineraryResultCache, ItineraryGeneration, activity_fingerprint
+from utils.ndjson_parser import ItineraryLineParser
+from utils.sse_sessions import StreamSessions, StreamGap
+from utils.itinerary_plans import ItineraryPlan, ItineraryPlanStore, item_date
+from utils.precompute_queue import PrecomputeQueue
+from utils.llm_gateway import llm_gateway, LLMOverloaded
+from utils.metrics import (
+    registry, register_cache,
+    SPRING_FETCH_SECONDS, ACTIVITY_COUNT, PROMPT_CHARS, PROMPT_TOKENS, TIME_TO_FIRST_TOKEN_SECONDS, OUTPUT_TOKENS,
+    GENERATION_SECONDS, TIME_TO_FIRST_ITEM_SECONDS, ITEM_GAP_SECONDS, STREAM_SECONDS, STREAM_ITEMS, STREAM_ERRORS, SSE_RECONNECTS,
+    BATCH_USERS, RECOMMENDATION_SECONDS, RECOMMENDATION_REQUESTS,
+)
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_client()
+    load_tokenizer_in_background()
+    precompute_queue.start()
+    yield
+    await precompute_queue.stop()
+    await close_client()
+    await recommendation_cache.flush()
+    recommendation_cache.close()
+
+app = FastAPI(lifespan=lifespan)
+
+# Shared across requests, concurrent descriptions are classified together in one structured-output call
+recommendation_batcher = RecommendationBatcher(llm_gateway, {"model": "gpt-4.1", "temperature": 0.1})
+# Answers for descriptions the local classifier wasn't confident about, optionally persisted via RECOMMENDATION_CACHE_DB
+recommendation_cache = RecommendationCache()
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,13 +67,22 @@ app.add_middleware(
     allow_headers=["*"], 
 )
 
+# Calls the LLM gateway sheds under overload answer 429 right away instead of queueing indefinitely
+@app.exception_handler(LLMOverloaded)
+async def llm_overloaded(request, e: LLMOverloaded):
+    return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": str(e.retry_after)})
+
 @app.get("/health")
 def sendHello():
     return "Server healthy"
 
+@app.get("/metrics")
+def getMetrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/sample-response")
-def getSampleResponse():
-    model = ChatOpenAI(model="gpt-4.1")
+async def getSampleResponse():
+    model = llm_gateway.model(model="gpt-4.1")
     structured_output_model = model.with_structured_output(Itinerary)
 
     system_prompt = SystemMessage(content="""
@@ -105,63 +153,60 @@ def getSampleResponse():
         Estimated Duration: 2 hours
     """))
     
-    res = structured_output_model.invoke(messages)
+    res = await llm_gateway.invoke(structured_output_model, messages)
     return {"itinerary": res}
 
 class DescriptionBody(BaseModel):
     description:str
 @app.post("/get-recommendations")
-async def getItinerary(descriptionBody:DescriptionBody):
+async def getItinerary(descriptionBody:DescriptionBody, response:Response):
     try:
-        model=ChatOpenAI(model="gpt-4.1",temperature=0.1)
-        messages=[] 
-        system_message = SystemMessage(content="""
-        You are a helpful assistant that receives user descriptions about their desired trip experience.
-        Your task is to analyze these descriptions and infer the types of activity categories the user is most likely interested in.
-        You are allowed to infer loosely, and try to associate as many categories as you can.
-        """)
-        human_message=HumanMessage(content=descriptionBody.description)
-
-        structured_model=model.with_structured_output(schema=CategoryList)
-
-        messages.extend([system_message,human_message])
-        result=structured_model.invoke(messages)
-        print(result)
+        started=time.perf_counter()
+        timings={}
+
+        # Clear-cut descriptions are answered by the local classifier, the LLM only sees the ambiguous ones
+        categories,confidence=classify_description(descriptionBody.description)
+        timings["classify"]=time.perf_counter()-started
+        if confidence>=CATEGORY_CONFIDENCE_THRESHOLD:
+            print(f"local classifier ({confidence:.2f}): {categories}")
+            source="local"
+            category_list=[CategoryType(category_type=category) for category in categories]
+        else:
+            cached=recommendation_cache.get(descriptionBody.description)
+            timings["cache"]=time.perf_counter()-started-sum(timings.values())
+            if cached is not None:
+                categories,tier=cached
+                source=f"cache:{tier}"
+                category_list=[CategoryType(category_type=category) for category in categories]
+            else:
+                result=await recommendation_batcher.classify(descriptionBody.description)
+                timings["llm"]=time.perf_counter()-started-sum(timings.values())
+                print(f"llm classifier (local confidence {confidence:.2f}): {result}")
+                recommendation_cache.put(descriptionBody.description,[category.category_type for category in result.category_list])
+                source="llm"
+                category_list=result.category_list
+
+        elapsed=time.perf_counter()-started
+        RECOMMENDATION_SECONDS.observe(elapsed,source=source)
+        RECOMMENDATION_REQUESTS.inc(source=source)
+        timings["total"]=elapsed
+        response.headers["Server-Timing"]=", ".join(f"{stage};dur={seconds*1000:.2f}" for stage,seconds in timings.items())
         return {
-            "category_list":result.category_list
+            "category_list":category_list,
+            "source":source,
+            "confidence":confidence
         }
+    except LLMOverloaded:
+        raise
     except Exception as e:
         print(str(e))
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-# Alternative approach using Server-Sent Events (SSE)
-@app.get("/stream-itinerary-sse/{userId}")
-async def stream_itinerary_sse(userId :str):
-    async def generate_sse_stream(userId) -> AsyncGenerator[str, None]:
-        try:
-            activity_list=[]
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{os.getenv('SPRING_API_URL')}/activities?userId={userId}")
-                if response.status_code == 200:
-                    data=response.json()
-                    print(data)
-                    activity_list=data["data"]
-                    if(len(activity_list)==0):
-                        raise Exception ("No activities selected")
-                else:
-                    raise Exception ("Internal server error, unable to relay data to LLM")
+# Bump whenever the itinerary prompt changes, so cached itineraries planned with the old prompt are not replayed
+ITINERARY_PROMPT_VERSION = f"4-{PROMPT_ENCODING}"
 
-            # Send initial connection message
-            yield "data: " + json.dumps({"type": "connected", "message": "Stream started"}) + "\n\n"
-            
-            model = ChatOpenAI(
-                model="gpt-4.1",
-                streaming=True,
-                temperature=0.1
-            )
-
-            system_prompt = SystemMessage(content="""
+ITINERARY_SYSTEM_PROMPT = """
             You are a travel planning assistant. Create an itinerary from a selected list of activities and present each activity as a separate JSON object.
                                           
             Each activity includes:
@@ -171,10 +216,9 @@ async def stream_itinerary_sse(userId :str):
             - An estimated duration in hours or minutes
 
             You should:
-            - Estimate travel time between activities using the Haversine distance formula
             - Decide the optimal sequence of activities based on their descriptions, duration, and location.
-            - Insert appropriate rest intervals based on the flow of the itinerary (e.g., after physically demanding activities or during long gaps)
-            - Mark any unused time slots as "rest"
+            - Leave time between activities for travel and for rest based on the flow of the itinerary (e.g., after physically demanding activities)
+            - Do not output travel or rest items, they are added to the itinerary automatically
             - Keep roughly 4-5 activities per day and move on to the following day, unless you think it's necessary to include more.
 
             Guidelines:
@@ -188,49 +232,319 @@ async def stream_itinerary_sse(userId :str):
             {"activity_name": "...", "activity_type": "...", "start_time": "...", "end_time": "...", "activity_id":"..."}
             
             Output one activity per line, followed by a newline.
-            Activity types must be one of: "rest", "adventure", "tourist attraction", "commute"
+            Activity types must be one of: "adventure", "tourist attraction"
             Times must be in ISO 8601 format: "2025-06-27T08:00:00"
-            For activities of type 'rest' or 'commute' as well as activities not linked to the activity list, set a randomly generate activity id, otherwise use the given activity_id
-            
-            Start the itinerary at 8:00 AM on July 15th, 2025, you may span it across several days
-            """)
+            Only output the given activities, each with its given activity_id
+            """
 
-            formatted_activity_message=format_activity(activity_list)
+TRIP_START_INSTRUCTION = "Start the itinerary at 8:00 AM on July 15th, 2025, you may span it across several days"
+DAY_INSTRUCTION = "These activities have already been grouped into day {day} of the trip. Plan only this day: start at 8:00 AM on {date:%B %d, %Y} and keep every item on that date"
 
+# Trips with more activities than this are clustered into days first, and the days are generated concurrently
+PARALLEL_DAYS_MIN_ACTIVITIES = int(os.getenv("PARALLEL_DAYS_MIN_ACTIVITIES", "10"))
+DAY_GENERATION_CONCURRENCY = int(os.getenv("DAY_GENERATION_CONCURRENCY", "4"))
 
-            messages = [system_prompt]
-            messages.append(HumanMessage(f"""
-            Create an itinerary for these activities in Delhi:
-            {formatted_activity_message}
-            """))
+# Finished itineraries by activity fingerprint, concurrent requests for the same activities share one generation
+itinerary_cache = ItineraryResultCache()
+# Running SSE streams by the key in their event ids, kept for SSE_RESUME_GRACE_SECONDS after the last client leaves
+sse_sessions = StreamSessions()
+# The last itinerary streamed to each user, the base for incremental re-planning
+itinerary_plans = ItineraryPlanStore()
 
-            # Stream and parse response
-            full_response = ""
-            async for chunk in model.astream(messages):
-                if chunk.content:
-                    full_response += chunk.content
-                    
-                    # Look for complete JSON lines
-                    lines = full_response.split('\n')
-                    for i, line in enumerate(lines[:-1]):  # Exclude the last incomplete line
-                        line = line.strip()
-                        if line and line.startswith('{') and line.endswith('}'):
-                            try:
-                                item_data = json.loads(line)
-                                if all(key in item_data for key in ['activity_name', 'activity_type', 'start_time', 'end_time','activity_id']):
-                                    yield f"data: {json.dumps({'type': 'item', 'data': item_data})}\n\n"
-                                    # Remove processed line from full_response
-                                    full_response = '\n'.join(lines[i+1:])
-                                    break
-                            except json.JSONDecodeError:
-                                continue
+register_cache("activities", activity_cache)
+register_cache("recommendations", recommendation_cache)
+register_cache("itineraries", itinerary_cache)
+
+
+async def generate_itinerary_items(activity_list, stats=None, day=None, priority="interactive") -> AsyncGenerator[dict, None]:
+    model = llm_gateway.model(
+        model="gpt-4.1",
+        streaming=True,
+        temperature=0.1
+    )
+
+    # The prompt may refer to activities by short local ids, the items are mapped back to the real ones
+    formatted_activity_message,prompt_ids=encode_activities(activity_list)
+    real_ids=dict(zip(prompt_ids, (str(activity['id']) for activity in activity_list)))
+    # The solver is CPU-bound, it runs off the event loop so other streams keep flowing meanwhile
+    route_hint=format_route_hint(activity_list, await asyncio.to_thread(plan_route, activity_list), prompt_ids)
+
+    if day is None:
+        start_instruction=TRIP_START_INSTRUCTION
+        day_date=None
+    else:
+        day_date=(TRIP_START+timedelta(days=day)).date()
+        start_instruction=DAY_INSTRUCTION.format(day=day+1, date=day_date)
+
+    messages = [SystemMessage(content=ITINERARY_SYSTEM_PROMPT)]
+    messages.append(HumanMessage(f"""
+    Create an itinerary for these activities in Delhi:
+    {formatted_activity_message}
+    Suggested visiting order by activity_id (shortest travel path, precomputed), follow it unless the nature of the activities calls for a different order:
+    {route_hint}
+    {start_instruction}
+    """))
+
+    prompt_chars = sum(len(message.content) for message in messages)
+    prompt_tokens = sum(count_tokens(message.content) for message in messages)
+    PROMPT_CHARS.observe(prompt_chars)
+    PROMPT_TOKENS.observe(prompt_tokens)
+
+    # Stream and parse response, every complete line is emitted as soon as its newline arrives,
+    # together with the commute and rest rows the gap filler inserts before it.
+    # A day's items are kept on its date even if the model drifts to another one
+    parser = ItineraryLineParser()
+    gap_filler = GapFiller(activity_list, day_date)
+    # Generation is timed from admission, the wait for a gateway slot is reported on its own
+    requested = time.perf_counter()
+    started = None
+    first_token = None
+    output_tokens = 0
+
+    def admitted():
+        nonlocal started
+        started = time.perf_counter()
+
+    async for chunk in llm_gateway.stream(model, messages, priority, prompt_tokens, admitted):
+        if chunk.content:
+            output_tokens += 1
+            if first_token is None:
+                first_token = time.perf_counter() - started
+                TIME_TO_FIRST_TOKEN_SECONDS.observe(first_token)
+            for item_data in parser.feed(chunk.content):
+                item_data['activity_id'] = real_ids.get(item_data['activity_id'], item_data['activity_id'])
+                for filled_item in gap_filler.feed(item_data):
+                    yield filled_item
+    for item_data in parser.close():
+        item_data['activity_id'] = real_ids.get(item_data['activity_id'], item_data['activity_id'])
+        for filled_item in gap_filler.feed(item_data):
+            yield filled_item
+
+    generation_seconds = time.perf_counter() - started
+    GENERATION_SECONDS.observe(generation_seconds)
+    OUTPUT_TOKENS.observe(output_tokens)
+    if stats is not None:
+        stats.update({
+            "prompt_chars": prompt_chars,
+            "prompt_tokens": prompt_tokens,
+            "tokenizer": tokenizer_name(),
+            "queue_wait_ms": round((started - requested) * 1000, 2),
+            "time_to_first_token_ms": round(first_token * 1000, 2) if first_token is not None else None,
+            "output_tokens": output_tokens,
+            "generation_ms": round(generation_seconds * 1000, 2),
+            "skipped_lines": parser.skipped,
+        })
+
+
+async def generate_itinerary_by_day(activity_list, stats=None, priority="interactive") -> AsyncGenerator[dict, None]:
+    """
+    Clusters the activities into days by location, generates every day concurrently (at most
+    DAY_GENERATION_CONCURRENCY at a time) and streams the merged result in day order, each day as soon as it's ready.
+    """
+    # k-means over the activities is CPU-bound, keep it off the event loop like the route solver
+    days=await asyncio.to_thread(cluster_days, activity_list)
+    semaphore=asyncio.Semaphore(DAY_GENERATION_CONCURRENCY)
+    day_stats=[{} for _ in days]
+
+    async def generate_day(day):
+        async with semaphore:
+            async for item_data in generate_itinerary_items([activity_list[i] for i in days[day]], day_stats[day], day, priority):
+                yield item_data
+
+    generations=[ItineraryGeneration(generate_day(day)) for day in range(len(days))]
+    try:
+        for generation in generations:
+            async for item_data in generation.subscribe():
+                yield item_data
+    finally:
+        for generation in generations:
+            generation.task.cancel()
+
+    if stats is not None:
+        stats.update({"days": len(days), **merge_day_stats(day_stats)})
+
+
+async def generate_itinerary_replan(plan, replanned_days, stats=None, priority="interactive") -> AsyncGenerator[dict, None]:
+    """
+    Streams the itinerary after a small edit in date order: days the edit didn't touch are replayed from the
+    previous plan as they were, the replanned days are regenerated concurrently like generate_itinerary_by_day.
+    """
+    semaphore=asyncio.Semaphore(DAY_GENERATION_CONCURRENCY)
+    day_stats={day: {} for day in replanned_days}
+
+    async def generate_day(day, day_activities):
+        async with semaphore:
+            async for item_data in generate_itinerary_items(day_activities, day_stats[day], (day-TRIP_START.date()).days, priority):
+                yield item_data
+
+    generations={day: ItineraryGeneration(generate_day(day, day_activities)) for day, day_activities in replanned_days.items() if day_activities}
+    try:
+        for day in sorted(set(plan.days()) | set(replanned_days)):
+            if day in generations:
+                async for item_data in generations[day].subscribe():
+                    yield item_data
+            elif day not in replanned_days:
+                for item_data in plan.items_on(day):
+                    yield item_data
+    finally:
+        for generation in generations.values():
+            generation.task.cancel()
+
+    if stats is not None:
+        stats.update({"replanned_days": len(replanned_days), **merge_day_stats([day_stats[day] for day in sorted(day_stats)])})
+
+
+def merge_day_stats(day_stats):
+    return {
+        "prompt_chars": sum(day.get("prompt_chars", 0) for day in day_stats),
+        "prompt_tokens": sum(day.get("prompt_tokens", 0) for day in day_stats),
+        "tokenizer": tokenizer_name(),
+        "queue_wait_ms": max((day.get("queue_wait_ms", 0) for day in day_stats), default=0),
+        "time_to_first_token_ms": day_stats[0].get("time_to_first_token_ms") if day_stats else None,
+        "output_tokens": sum(day.get("output_tokens", 0) for day in day_stats),
+        "generation_ms": max((day.get("generation_ms", 0) for day in day_stats), default=0),
+        "skipped_lines": sum(day.get("skipped_lines", 0) for day in day_stats),
+    }
+
+
+def itinerary_producer(activity_list, stats=None, priority="interactive"):
+    if len(activity_list) > PARALLEL_DAYS_MIN_ACTIVITIES:
+        return generate_itinerary_by_day(activity_list, stats, priority)
+    return generate_itinerary_items(activity_list, stats, priority=priority)
+
+
+async def needs_generation(userId):
+    """Whether a new LLM-mode stream for this user would call the LLM, as far as can be told before it starts."""
+    try:
+        activity_list=await fetch_activities(userId)
+    except Exception:
+        # The stream fetches again and reports the failure itself
+        return False
+    return bool(activity_list) and not itinerary_cache.available(activity_fingerprint(activity_list, ITINERARY_PROMPT_VERSION))
+
+
+# Alternative approach using Server-Sent Events (SSE)
+# Streams outlive their connection, a client that reconnects with Last-Event-ID resumes where it left off
+# A client holding the itinerary from an earlier `connected` event's fingerprint can pass it as `base`, and after a
+# small edit gets only the replanned days as patch events instead of the whole itinerary
+@app.get("/stream-itinerary-sse/{userId}")
+async def stream_itinerary_sse(userId :str, mode: Literal["llm", "local"] = "llm", stats: bool = False, base: Optional[str] = None,
+                               last_event_id: Optional[str] = Header(default=None)):
+    async def generate_sse_events(userId) -> AsyncGenerator[dict, None]:
+        try:
+            started=time.perf_counter()
+            activity_list=await fetch_activities(userId)
+            fetch_seconds=time.perf_counter()-started
+            SPRING_FETCH_SECONDS.observe(fetch_seconds)
+            ACTIVITY_COUNT.observe(len(activity_list))
+            if(len(activity_list)==0):
+                raise Exception ("No activities selected")
+
+            fingerprint=activity_fingerprint(activity_list, ITINERARY_PROMPT_VERSION)
+            cached_items=itinerary_cache.get(fingerprint) if mode == "llm" else None
+            cached=cached_items is not None
+            plan=itinerary_plans.get(userId) if mode == "llm" else None
+            if cached:
+                # A precomputed itinerary is served from the cache, a client holding the last plan still only
+                # gets the days that differ from it
+                replanned_days=plan.changed_days(cached_items) if plan is not None and base == plan.fingerprint else None
+            else:
+                # After a small edit only the affected days go back to the LLM, the rest of the last plan is reused
+                replanned_days=plan.replan(activity_list) if plan is not None else None
+            patch=replanned_days is not None and base == plan.fingerprint
+            source="local" if mode == "local" else "cache" if cached else "replan" if replanned_days is not None else "llm"
+
+            # Send initial connection message
+            yield {"type": "connected", "message": "Stream started", "cached": cached, "fingerprint": fingerprint, "patch": patch}
+
+            async def local_items():
+                # Local mode plans the whole itinerary with the route solver and never calls the LLM,
+                # its activities get their commute and rest rows from the same gap filler as the LLM's
+                gap_filler=GapFiller(activity_list)
+                for item in await asyncio.to_thread(build_local_itinerary, activity_list):
+                    for filled_item in gap_filler.feed(item.model_dump(mode='json')):
+                        yield filled_item
+
+            generation_stats={}
+            if mode == "local":
+                items=local_items()
+            elif replanned_days is not None and not cached:
+                items=itinerary_cache.stream(fingerprint, lambda: generate_itinerary_replan(plan, replanned_days, generation_stats))
+            else:
+                items=itinerary_cache.stream(fingerprint, lambda: itinerary_producer(activity_list, generation_stats))
+
+            if patch:
+                # The client drops these days and rebuilds them from the patch items that follow
+                yield {"type": "patch", "action": "replace_days", "dates": [day.isoformat() for day in replanned_days]}
+
+            itinerary=[]
+            item_count=0
+            first_item=None
+            last_item=None
+            async for item_data in items:
+                itinerary.append(item_data)
+                if patch and item_date(item_data) not in replanned_days:
+                    continue
+                now=time.perf_counter()
+                if first_item is None:
+                    first_item=now-started
+                    TIME_TO_FIRST_ITEM_SECONDS.observe(first_item, source=source)
+                else:
+                    ITEM_GAP_SECONDS.observe(now-last_item, source=source)
+                last_item=now
+                item_count+=1
+                if patch:
+                    yield {'type': 'patch', 'action': 'item', 'data': item_data}
+                else:
+                    yield {'type': 'item', 'data': item_data}
+
+            if mode == "llm":
+                itinerary_plans.put(userId, ItineraryPlan(fingerprint, activity_list, itinerary))
+
+            duration=time.perf_counter()-started
+            STREAM_SECONDS.observe(duration, source=source)
+            STREAM_ITEMS.observe(item_count, source=source)
+            if stats:
+                stream_stats={
+                    "source": source,
+                    "activity_count": len(activity_list),
+                    "fetch_ms": round(fetch_seconds*1000, 2),
+                    "time_to_first_item_ms": round(first_item*1000, 2) if first_item is not None else None,
+                    "items": item_count,
+                    "duration_ms": round(duration*1000, 2),
+                    **generation_stats,
+                }
+                yield {'type': 'stats', 'data': stream_stats}
             
             # Send completion signal
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            yield {'type': 'complete'}
             
         except Exception as e:
             print(e)
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            STREAM_ERRORS.inc()
+            error={'type': 'error', 'message': str(e)}
+            if isinstance(e, LLMOverloaded):
+                error['retry_after']=e.retry_after
+            yield error
+
+    async def generate_sse_stream(userId) -> AsyncGenerator[str, None]:
+        session, after=resumed or (sse_sessions.start(userId, generate_sse_events(userId)), 0)
+        try:
+            async for event in session.subscribe(after):
+                yield event
+        except StreamGap as e:
+            # This connection fell further behind than the replay buffer, the client's reconnect starts over
+            print(e)
+
+    resumed=sse_sessions.resume(userId, last_event_id) if last_event_id else None
+    if last_event_id:
+        SSE_RECONNECTS.inc(result="resumed" if resumed else "restarted")
+
+    # Shed streams that would start a generation while the LLM queue is full, resumed ones already hold their place
+    # and cached or in-flight itineraries are served without the LLM.
+    # A Last-Event-ID that can't be resumed starts over, so it's shed like a new stream
+    if mode == "llm" and resumed is None and llm_gateway.saturated("interactive") and await needs_generation(userId):
+        raise LLMOverloaded(llm_gateway.retry_after("interactive"))
 
     return StreamingResponse(
         generate_sse_stream(userId),
@@ -245,6 +559,152 @@ async def stream_itinerary_sse(userId :str):
     )
 
 
+# Bulk pre-generation for tour groups and campaign cohorts
+BATCH_MAX_USERS = int(os.getenv("BATCH_MAX_USERS", "500"))
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "16"))
+# Shared by every batch request, on top of the LLM gateway's limits so one large batch can't fill the whole queue
+BATCH_GENERATION_CONCURRENCY = int(os.getenv("BATCH_GENERATION_CONCURRENCY", "8"))
+# Events waiting for a slow client, beyond this the generations wait instead of piling up in memory
+BATCH_FEED_BUFFER = 256
+
+batch_fetch_semaphore = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+batch_generation_semaphore = asyncio.Semaphore(BATCH_GENERATION_CONCURRENCY)
+
+class BatchItineraryBody(BaseModel):
+    userIds:List[str]
+    format:Literal["ndjson", "sse"]="ndjson"
+
+async def generate_user_itinerary(userId, emit):
+    """Emits one user's events to a batch feed, a failure only ends this user's part of the feed."""
+    try:
+        started=time.perf_counter()
+        async with batch_fetch_semaphore:
+            activity_list=await fetch_activities(userId)
+        if(len(activity_list)==0):
+            raise Exception ("No activities selected")
+
+        fingerprint=activity_fingerprint(activity_list, ITINERARY_PROMPT_VERSION)
+        cached=itinerary_cache.get(fingerprint) is not None
+        itinerary=[]
+        # Cached itineraries are only replayed, they don't take a generation slot
+        async with nullcontext() if cached else batch_generation_semaphore:
+            async for item_data in itinerary_cache.stream(fingerprint, lambda: itinerary_producer(activity_list, priority="batch")):
+                itinerary.append(item_data)
+                await emit({"userId": userId, "type": "item", "data": item_data})
+        # The stored plan is the base the user's own client patches against, a batch run only seeds a missing one
+        if itinerary_plans.get(userId) is None:
+            itinerary_plans.put(userId, ItineraryPlan(fingerprint, activity_list, itinerary))
+
+        BATCH_USERS.inc(result="complete")
+        await emit({
+            "userId": userId,
+            "type": "complete",
+            "source": "cache" if cached else "llm",
+            "items": len(itinerary),
+            "duration_ms": round((time.perf_counter()-started)*1000, 2),
+        })
+    except Exception as e:
+        print(f"{userId}: {e}")
+        BATCH_USERS.inc(result="error")
+        error={"userId": userId, "type": "error", "message": str(e)}
+        if isinstance(e, LLMOverloaded):
+            error["retry_after"]=e.retry_after
+        await emit(error)
+
+@app.post("/batch-itinerary")
+async def batch_itinerary(batchBody:BatchItineraryBody):
+    userIds=list(dict.fromkeys(batchBody.userIds))
+    if not userIds or len(userIds)>BATCH_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {BATCH_MAX_USERS} userIds are required")
+
+    if batchBody.format == "sse":
+        media_type="text/event-stream"
+        format_event=lambda event: f"data: {json.dumps(event)}\n\n"
+    else:
+        media_type="application/x-ndjson"
+        format_event=lambda event: json.dumps(event) + "\n"
+
+    async def generate_batch_stream() -> AsyncGenerator[str, None]:
+        # Every user's events are multiplexed onto one feed in the order they are produced, tagged by userId
+        events=asyncio.Queue(maxsize=BATCH_FEED_BUFFER)
+        tasks=[asyncio.create_task(generate_user_itinerary(userId, events.put)) for userId in userIds]
+
+        async def close_feed():
+            await asyncio.gather(*tasks)
+            await events.put(None)
+
+        closer=asyncio.create_task(close_feed())
+        failed=0
+        try:
+            while (event := await events.get()) is not None:
+                if event["type"] == "error":
+                    failed+=1
+                yield format_event(event)
+            yield format_event({"type": "summary", "users": len(userIds), "failed": failed})
+        finally:
+            # A client that goes away stops the remaining users, generations already running still finish into the cache
+            closer.cancel()
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        generate_batch_stream(),
+        media_type=media_type,
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+            "Access-Control-Allow-Headers": "*",
+        }
+    )
+
+
+# Itineraries are precomputed when the Spring service reports a changed selection, so the first
+# /stream-itinerary-sse request is answered from the itinerary cache
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+async def precompute_itinerary(userId):
+    # The change makes any cached activities for this user stale
+    activity_cache.invalidate(userId)
+    activity_list=await fetch_activities(userId)
+    if(len(activity_list)==0):
+        return
+    fingerprint=activity_fingerprint(activity_list, ITINERARY_PROMPT_VERSION)
+    if itinerary_cache.get(fingerprint) is not None:
+        return
+
+    # The stored plan stays the one the user's client holds, so it isn't replaced here
+    plan=itinerary_plans.get(userId)
+    replanned_days=plan.replan(activity_list) if plan is not None else None
+    if replanned_days is not None:
+        items=itinerary_cache.stream(fingerprint, lambda: generate_itinerary_replan(plan, replanned_days, priority="precompute"))
+    else:
+        items=itinerary_cache.stream(fingerprint, lambda: itinerary_producer(activity_list, priority="precompute"))
+    async for _ in items:
+        pass
+
+precompute_queue = PrecomputeQueue(precompute_itinerary)
+
+class ActivityChangeBody(BaseModel):
+    userIds:List[str]
+
+@app.post("/webhooks/activities-changed", status_code=202)
+async def activities_changed(changeBody:ActivityChangeBody, x_webhook_secret: Optional[str] = Header(default=None)):
+    if WEBHOOK_SECRET and not hmac.compare_digest(x_webhook_secret or "", WEBHOOK_SECRET):
+        raise HTTPException(status_code=401, detail="Invalid webhook secret")
+    userIds=list(dict.fromkeys(changeBody.userIds))
+    rejected=[userId for userId in userIds if not precompute_queue.enqueue(userId)]
+    if rejected:
+        # Enqueueing is idempotent, the caller can safely retry the whole batch
+        raise HTTPException(status_code=503, detail=f"Precompute queue is full, {len(rejected)} of {len(userIds)} users not queued")
+    return {"queued": len(userIds)}
+
+@app.get("/precompute/stats")
+def getPrecomputeStats():
+    return precompute_queue.stats()
+
+
 # Streaming endpoint
 # @app.get("/stream-itinerary")
 # async def stream_itinerary():
@@ -7,4 +7,7 @@ class CategoryType(BaseModel):
     )
     
 class CategoryList(BaseModel):
-    category_list:List[CategoryType]=Field(description="A list of categories that is further used to filter and search activities by category for the user")
\ No newline at end of file
+    category_list:List[CategoryType]=Field(description="A list of categories that is further used to filter and search activities by category for the user")
+
+class CategoryListBatch(BaseModel):
+    results:List[CategoryList]=Field(description="One category list per numbered user description, in the same order as the descriptions were given")
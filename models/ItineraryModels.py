@@ -42,3 +42,13 @@ class ItineraryItem(BaseModel):
 class Itinerary(BaseModel):
     items: List[ItineraryItem]
 
+
+class ItineraryStreamItem(ItineraryItem):
+    """
+    An itinerary item as emitted on the SSE stream, linked back to the activity it was planned from.
+    """
+
+    activity_id: str = Field(
+        description="Id of the selected activity, or a generated id for 'rest' and 'commute' items.",
+        coerce_numbers_to_str=True
+    )
@@ -0,0 +1,26 @@
+import pytest
+
+from utils.category_classifier import CATEGORY_CONFIDENCE_THRESHOLD, classify_description
+
+
+def test_confident_on_lexicon_words():
+    categories, confidence = classify_description("I love museums and history")
+    assert categories[0] == "History" and confidence >= CATEGORY_CONFIDENCE_THRESHOLD
+
+
+@pytest.mark.parametrize("description", ["museum hopping", "cart", "artisans"])
+def test_lookalike_words_are_not_matched(description):
+    categories, confidence = classify_description(description)
+    assert "Retail Therapy" not in categories and "Art" not in categories
+    assert confidence < CATEGORY_CONFIDENCE_THRESHOLD
+
+
+def test_misspelling_counts_less_than_exact_word():
+    categories, confidence = classify_description("hikking and trekking")
+    assert "Adventure" in categories
+    assert confidence < classify_description("hiking and trekking")[1]
+
+
+@pytest.mark.parametrize("description", ["no museums, I hate history", "I don't like shopping", "avoid temples please"])
+def test_negated_descriptions_go_to_the_llm(description):
+    assert classify_description(description)[1] < CATEGORY_CONFIDENCE_THRESHOLD
@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks.fakes import synthetic_activities
+from utils.day_clustering import cluster_days
+
+
+# Seeds where every day ran out of minutes for some activity before the fix
+@pytest.mark.parametrize("count, seed", [(12, 0), (60, 1), (60, 10), (200, 6), (200, 10)])
+def test_days_cover_every_activity_within_the_limit(count, seed):
+    days = cluster_days(synthetic_activities(count, seed), max_per_day=5)
+    assert sorted(index for day in days for index in day) == list(range(count))
+    assert max(len(day) for day in days) <= 5
+
+
+def test_minutes_budget_never_pushes_a_day_past_the_activity_limit():
+    activities = synthetic_activities(40, 1)
+    for activity in activities:
+        activity["duration"] = 240
+    days = cluster_days(activities, max_per_day=5, day_budget_minutes=600)
+    assert max(len(day) for day in days) <= 5
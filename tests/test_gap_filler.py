@@ -0,0 +1,96 @@
+from datetime import date, datetime, timedelta
+
+from utils.gap_filler import GapFiller
+from utils.route_solver import DEFAULT_DURATION_MINUTES, REST_MINUTES
+
+ACTIVITIES = [
+    {"id": 1, "name": "Red Fort", "duration": 120, "latitude": 28.6562, "longitude": 77.2410},
+    {"id": 2, "name": "Qutub Minar", "duration": 90, "latitude": 28.5245, "longitude": 77.1855},
+    {"id": 3, "name": "Jama Masjid", "duration": 60, "latitude": 28.6507, "longitude": 77.2334},
+]
+
+
+def _item(activity_id, start, end, name=None):
+    return {"activity_name": name or f"Activity {activity_id}", "activity_type": "tourist attraction",
+            "start_time": start, "end_time": end, "activity_id": str(activity_id)}
+
+
+def _feed(filler, *items):
+    return [row for item in items for row in filler.feed(item)]
+
+
+def _times(row):
+    return datetime.fromisoformat(row["start_time"]), datetime.fromisoformat(row["end_time"])
+
+
+def test_commute_inserted_between_activities():
+    rows = _feed(GapFiller(ACTIVITIES),
+                 _item(1, "2025-07-15T08:00:00", "2025-07-15T10:00:00"),
+                 _item(2, "2025-07-15T10:00:00", "2025-07-15T11:30:00"))
+    assert [row["activity_type"] for row in rows] == ["tourist attraction", "commute", "tourist attraction"]
+    commute = rows[1]
+    assert commute["activity_id"] == "commute-1-2" and commute["activity_name"] == "Commute to Qutub Minar"
+    assert commute["start_time"] == rows[0]["end_time"] and commute["end_time"] == rows[2]["start_time"]
+    # The model left no travel time, so Qutub Minar is pushed back by the commute and keeps its length
+    start, end = _times(rows[2])
+    assert start > datetime(2025, 7, 15, 10) and end - start == timedelta(minutes=90)
+
+
+def test_free_time_becomes_rest():
+    rows = _feed(GapFiller(ACTIVITIES),
+                 _item(1, "2025-07-15T08:00:00", "2025-07-15T10:00:00"),
+                 _item(3, "2025-07-15T12:00:00", "2025-07-15T13:00:00"))
+    assert [row["activity_type"] for row in rows] == ["tourist attraction", "rest", "commute", "tourist attraction"]
+    assert rows[1]["start_time"] == "2025-07-15T10:00:00" and rows[3]["start_time"] == "2025-07-15T12:00:00"
+
+
+def test_rest_forced_after_long_stretch():
+    rows = _feed(GapFiller(ACTIVITIES),
+                 _item(1, "2025-07-15T08:00:00", "2025-07-15T12:30:00"),
+                 _item(3, "2025-07-15T12:30:00", "2025-07-15T13:30:00"))
+    rest = [row for row in rows if row["activity_type"] == "rest"]
+    assert len(rest) == 1
+    start, end = _times(rest[0])
+    assert end - start >= timedelta(minutes=REST_MINUTES)
+
+
+def test_overlapping_and_out_of_order_items_pushed_back():
+    rows = _feed(GapFiller(ACTIVITIES),
+                 _item(1, "2025-07-15T08:00:00", "2025-07-15T10:00:00"),
+                 _item(3, "2025-07-15T09:00:00", "2025-07-15T10:00:00"),
+                 _item(2, "2025-07-15T08:30:00", "2025-07-15T10:00:00"))
+    times = [_times(row) for row in rows]
+    assert all(earlier[1] <= later[0] for earlier, later in zip(times, times[1:]))
+    assert times[-1][1] - times[-1][0] == timedelta(minutes=90)
+
+
+def test_model_rows_replaced_and_new_date_starts_new_day():
+    rows = _feed(GapFiller(ACTIVITIES),
+                 _item(1, "2025-07-15T08:00:00", "2025-07-15T10:00:00"),
+                 {**_item("x", "2025-07-15T10:00:00", "2025-07-15T10:30:00"), "activity_type": "commute"},
+                 _item(2, "2025-07-16T08:00:00", "2025-07-16T09:30:00"))
+    assert [row["activity_id"] for row in rows] == ["1", "2"]
+    assert rows[1]["start_time"] == "2025-07-16T08:00:00"
+
+
+def test_timezone_offsets_dropped():
+    rows = _feed(GapFiller(ACTIVITIES),
+                 _item(1, "2025-07-15T08:00:00", "2025-07-15T10:00:00"),
+                 _item(3, "2025-07-15T12:00:00Z", "2025-07-15T13:00:00Z"))
+    assert rows[-1]["start_time"] == "2025-07-15T12:00:00"
+
+
+def test_unknown_activity_without_duration_gets_default():
+    rows = _feed(GapFiller(ACTIVITIES), _item("lunch", "2025-07-15T13:00:00", "2025-07-15T13:00:00", name="Lunch"))
+    start, end = _times(rows[0])
+    assert end - start == timedelta(minutes=DEFAULT_DURATION_MINUTES)
+
+
+def test_pinned_day_keeps_every_item_on_its_date():
+    rows = _feed(GapFiller(ACTIVITIES, date(2025, 7, 17)),
+                 _item(1, "2025-07-15T21:00:00", "2025-07-15T23:30:00"),
+                 _item(2, "2025-07-15T23:00:00", "2025-07-16T00:30:00"),
+                 _item(3, "2025-07-16T08:00:00", "2025-07-16T09:00:00"))
+    times = [_times(row) for row in rows]
+    assert {moment.date() for span in times for moment in span} == {date(2025, 7, 17)}
+    assert all(earlier[1] <= later[0] for earlier, later in zip(times, times[1:]))
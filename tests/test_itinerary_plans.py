@@ -0,0 +1,101 @@
+from datetime import date, datetime, timedelta
+
+from utils.itinerary_plans import ItineraryPlan, ItineraryPlanStore
+
+DAY_1, DAY_2, DAY_3 = date(2025, 7, 15), date(2025, 7, 16), date(2025, 7, 17)
+
+
+def _activity(activity_id, latitude, longitude, duration=60):
+    return {"id": activity_id, "name": f"Activity {activity_id}", "description": "", "duration": duration,
+            "latitude": latitude, "longitude": longitude}
+
+
+# Day 1 in the north of the city, day 2 in the south, day 3 holds a single activity
+ACTIVITIES = ([_activity(i, 28.70 + i * 0.001, 77.20) for i in range(1, 5)]
+              + [_activity(i, 28.50 + i * 0.001, 77.20) for i in range(5, 9)]
+              + [_activity(9, 28.60, 77.30)])
+LAYOUT = {DAY_1: [1, 2, 3, 4], DAY_2: [5, 6, 7, 8], DAY_3: [9]}
+
+
+def _items(layout):
+    items = []
+    for day, activity_ids in layout.items():
+        clock = datetime.combine(day, datetime.min.time()).replace(hour=8)
+        for position, activity_id in enumerate(activity_ids):
+            if position:
+                items.append({"activity_name": "Commute", "activity_type": "commute", "start_time": clock.isoformat(),
+                              "end_time": (clock + timedelta(minutes=15)).isoformat(),
+                              "activity_id": f"commute-{activity_ids[position - 1]}-{activity_id}"})
+                clock += timedelta(minutes=15)
+            items.append({"activity_name": f"Activity {activity_id}", "activity_type": "tourist attraction",
+                          "start_time": clock.isoformat(), "end_time": (clock + timedelta(hours=1)).isoformat(),
+                          "activity_id": str(activity_id)})
+            clock += timedelta(hours=1)
+    return items
+
+
+def _plan():
+    return ItineraryPlan("fingerprint", ACTIVITIES, _items(LAYOUT))
+
+
+def _ids(replanned):
+    return {day: [activity["id"] for activity in activities] for day, activities in replanned.items()}
+
+
+def test_days_lists_only_real_activities():
+    assert _plan().days() == {day: [str(activity_id) for activity_id in ids] for day, ids in LAYOUT.items()}
+
+
+def test_unchanged_activities_need_no_replan():
+    assert _plan().replan(ACTIVITIES) == {}
+
+
+def test_removed_activity_replans_its_day():
+    activities = [activity for activity in ACTIVITIES if activity["id"] != 2]
+    assert _ids(_plan().replan(activities)) == {DAY_1: [1, 3, 4]}
+
+
+def test_changed_activity_replans_its_day():
+    activities = [dict(activity, duration=120) if activity["id"] == 6 else activity for activity in ACTIVITIES]
+    replanned = _ids(_plan().replan(activities))
+    assert replanned == {DAY_2: [5, 6, 7, 8]}
+
+
+def test_added_activity_joins_the_nearest_day_with_room():
+    activities = ACTIVITIES + [_activity(10, 28.506, 77.201)]
+    assert _ids(_plan().replan(activities, max_per_day=5)) == {DAY_2: [5, 6, 7, 8, 10]}
+
+
+def test_added_activity_opens_a_new_day_when_all_are_full():
+    activities = ACTIVITIES + [_activity(10, 28.506, 77.201)]
+    assert _ids(_plan().replan(activities, max_per_day=4)) == {DAY_3: [9, 10]}
+    activities = [activity for activity in ACTIVITIES if activity["id"] != 9] + [_activity(10, 28.506, 77.201)]
+    replanned = _plan().replan(activities, max_per_day=4, max_changed_fraction=1)
+    assert _ids(replanned) == {DAY_3: [], date(2025, 7, 18): [10]}
+
+
+def test_day_emptied_by_removals_stays_free():
+    activities = [activity for activity in ACTIVITIES if activity["id"] != 9]
+    assert _ids(_plan().replan(activities)) == {DAY_3: []}
+
+
+def test_large_edit_falls_back_to_a_full_plan():
+    activities = [activity for activity in ACTIVITIES if activity["id"] not in (1, 2, 5, 6)]
+    assert _plan().replan(activities) is None
+    assert _plan().replan(activities, max_changed_fraction=1) is not None
+
+
+def test_changed_days_compares_day_by_day():
+    plan = _plan()
+    assert plan.changed_days(_items(LAYOUT)) == []
+    layout = {DAY_1: [1, 2, 3, 4], DAY_2: [5, 7, 6, 8]}
+    assert plan.changed_days(_items(layout)) == [DAY_2, DAY_3]
+
+
+def test_store_drops_least_recently_used():
+    store = ItineraryPlanStore(max_users=2)
+    store.put("a", _plan())
+    store.put("b", _plan())
+    store.get("a")
+    store.put("c", _plan())
+    assert store.get("b") is None and store.get("a") is not None and store.get("c") is not None
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from utils.llm_gateway import LLMGateway, LLMOverloaded
+
+DEADLINES = {"interactive": 5, "batch": 5, "precompute": 5}
+
+
+def _gateway(**kwargs):
+    settings = {"max_concurrent": 1, "tokens_per_minute": 0, "max_queue": 8, "deadlines": DEADLINES}
+    settings.update(kwargs)
+    return LLMGateway(**settings)
+
+
+async def _hold(gateway, release, priority="interactive"):
+    async with gateway.slot(0, priority):
+        await release.wait()
+
+
+def test_sheds_when_queue_is_full():
+    async def run():
+        gateway = _gateway(max_queue=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(gateway, release))
+        queued = asyncio.create_task(_hold(gateway, release))
+        await asyncio.sleep(0)
+        assert gateway.saturated("interactive")
+        with pytest.raises(LLMOverloaded):
+            async with gateway.slot(0):
+                pass
+        release.set()
+        await asyncio.gather(holder, queued)
+        return gateway.stats()
+
+    stats = asyncio.run(run())
+    assert stats["rejected"] == 1 and stats["admitted"] == 2 and stats["active"] == 0
+
+
+def test_sheds_when_wait_passes_the_deadline():
+    async def run():
+        gateway = _gateway(deadlines={**DEADLINES, "interactive": 0.05})
+        release = asyncio.Event()
+        holder = asyncio.create_task(_hold(gateway, release))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloaded) as shed:
+            async with gateway.slot(0):
+                pass
+        assert shed.value.retry_after >= 1
+        release.set()
+        await holder
+        return gateway.stats()
+
+    stats = asyncio.run(run())
+    assert stats["timed_out"] == 1 and stats["active"] == 0 and stats["queued"]["interactive"] == 0
+
+
+def test_admits_by_priority_then_arrival():
+    async def run():
+        gateway = _gateway()
+        release = asyncio.Event()
+        admitted = []
+
+        async def call(name, priority):
+            async with gateway.slot(0, priority):
+                admitted.append(name)
+
+        holder = asyncio.create_task(_hold(gateway, release))
+        await asyncio.sleep(0)
+        calls = [asyncio.create_task(call(name, priority)) for name, priority in
+                 [("precompute", "precompute"), ("batch-1", "batch"), ("interactive", "interactive"), ("batch-2", "batch")]]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *calls)
+        return admitted
+
+    assert asyncio.run(run()) == ["interactive", "batch-1", "batch-2", "precompute"]
+
+
+def test_releases_slot_when_cancelled_right_after_admission():
+    async def run():
+        gateway = _gateway()
+        entered = asyncio.Event()
+
+        async def call():
+            async with gateway.slot(0):
+                entered.set()
+
+        async with gateway.slot(0):
+            waiter = asyncio.create_task(call())
+            await asyncio.sleep(0)
+        # Leaving the slot admitted the waiter, cancel it before it gets to run
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert not entered.is_set()
+        assert gateway.active == 0
+
+        # The slot is free for the next caller
+        await asyncio.wait_for(call(), 1)
+        return gateway.stats()
+
+    stats = asyncio.run(run())
+    assert stats["active"] == 0 and stats["admitted"] == 3
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from utils.ndjson_parser import ItineraryLineParser
+
+
+def _line(activity_id, hour=8):
+    return json.dumps({"activity_name": f"Activity {activity_id}", "activity_type": "tourist attraction",
+                       "start_time": f"2025-07-15T{hour:02d}:00:00", "end_time": f"2025-07-15T{hour + 1:02d}:00:00",
+                       "activity_id": activity_id})
+
+
+def test_items_emitted_when_their_newline_arrives():
+    parser = ItineraryLineParser()
+    text = _line("1") + "\n" + _line("2", 10) + "\n"
+    emitted = []
+    for i in range(0, len(text), 7):
+        emitted.append([item["activity_id"] for item in parser.feed(text[i:i + 7])])
+    assert [activity_id for chunk in emitted for activity_id in chunk] == ["1", "2"]
+    # Nothing is held back once the line is complete
+    first_newline = text.index("\n") // 7
+    assert emitted[first_newline] == ["1"]
+    assert parser.close() == [] and parser.parsed == 2
+
+
+def test_several_lines_in_one_chunk_and_tail_kept_for_next():
+    parser = ItineraryLineParser()
+    second = _line("2", 10)
+    items = parser.feed(_line("1") + "\n" + second[:20])
+    assert [item["activity_id"] for item in items] == ["1"]
+    items = parser.feed(second[20:] + "\n" + _line("3", 12) + "\n")
+    assert [item["activity_id"] for item in items] == ["2", "3"]
+
+
+def test_close_flushes_unterminated_last_line():
+    parser = ItineraryLineParser()
+    assert parser.feed(_line("1")) == []
+    assert [item["activity_id"] for item in parser.close()] == ["1"]
+    assert parser.close() == []
+
+
+def test_malformed_lines_counted_and_skipped():
+    parser = ItineraryLineParser()
+    text = "\n".join([
+        "```json",
+        _line("1"),
+        "",
+        "Here is your itinerary:",
+        '{"activity_name": "Broken", "activity_type": "tourist attraction"}',
+        '{"activity_name": "Cut off"',
+        _line("2", 10),
+        "```",
+    ]) + "\n"
+    items = parser.feed(text)
+    assert [item["activity_id"] for item in items] == ["1", "2"]
+    assert parser.skipped == 3 and parser.parsed == 2
+
+
+def test_strict_mode_raises_on_malformed_line():
+    parser = ItineraryLineParser(strict=True)
+    with pytest.raises(ValueError):
+        parser.feed("not json\n")
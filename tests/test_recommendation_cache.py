@@ -0,0 +1,37 @@
+import asyncio
+
+from utils.recommendation_cache import RecommendationCache
+
+NIGHTLIFE = ("We are a group of friends looking for a fun city trip with great street food, rooftop bars, live music, "
+             "markets and lively nightlife {} clubs")
+
+
+def test_near_duplicate_shares_the_answer():
+    cache = RecommendationCache()
+    cache.put(NIGHTLIFE.format("with"), ["Leisure"])
+    assert cache.get(NIGHTLIFE.format("with").replace("fun", "fun!")) == (["Leisure"], "exact")
+    assert cache.get(NIGHTLIFE.format("with") + " and pubs") == (["Leisure"], "near")
+
+
+def test_near_duplicate_with_other_negations_is_a_miss():
+    cache = RecommendationCache()
+    cache.put(NIGHTLIFE.format("with"), ["Leisure"])
+    assert cache.get(NIGHTLIFE.format("without")) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_writes_are_persisted_off_the_event_loop(tmp_path):
+    db_path = str(tmp_path / "recommendations.db")
+
+    async def run():
+        cache = RecommendationCache(db_path=db_path)
+        cache.put("temples and old forts", ["History"])
+        cache.put("street food tour", ["Food & Drink"])
+        await cache.flush()
+        cache.close()
+
+    asyncio.run(run())
+    reloaded = RecommendationCache(db_path=db_path)
+    assert reloaded.get("temples and old forts") == (["History"], "exact")
+    assert reloaded.get("street food tour") == (["Food & Drink"], "exact")
+    reloaded.close()
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+
+from utils.sse_sessions import StreamGap, StreamSessions
+
+
+async def _events(count):
+    for i in range(count):
+        yield {"n": i + 1}
+
+
+async def _endless(started):
+    yield {"n": 1}
+    started.set()
+    await asyncio.Event().wait()
+
+
+def _payload(event):
+    return json.loads(event.split("data: ", 1)[1])["n"]
+
+
+def test_resume_replays_only_missed_events():
+    async def run():
+        sessions = StreamSessions()
+        session = sessions.start("user-1", _events(5))
+        received = []
+        stream = session.subscribe()
+        async for event in stream:
+            received.append(event)
+            if len(received) == 3:
+                break
+        await stream.aclose()
+
+        last_event_id = received[-1].split("\n", 1)[0].removeprefix("id: ")
+        resumed, after = sessions.resume("user-1", last_event_id)
+        assert resumed is session and after == 3
+        return [_payload(event) async for event in resumed.subscribe(after)]
+
+    assert asyncio.run(run()) == [4, 5]
+
+
+def test_resume_rejected_for_another_user():
+    async def run():
+        sessions = StreamSessions()
+        session = sessions.start("user-1", _events(3))
+        await session.task
+        assert sessions.resume("user-2", f"{session.key}:1") is None
+        assert sessions.resume("user-1", f"{session.key}:1") is not None
+        return sessions.stats()
+
+    stats = asyncio.run(run())
+    assert stats["resume_failures"] == 1 and stats["resumed"] == 1
+
+
+def test_resume_rejected_once_events_leave_the_buffer():
+    async def run():
+        sessions = StreamSessions(buffer_size=2)
+        session = sessions.start("user-1", _events(5))
+        await session.task
+        assert sessions.resume("user-1", f"{session.key}:1") is None
+        assert sessions.resume("user-1", f"{session.key}:3") is not None
+        with pytest.raises(StreamGap):
+            async for _ in session.subscribe(1):
+                pass
+
+    asyncio.run(run())
+
+
+def test_session_cancelled_after_grace_period():
+    async def run():
+        sessions = StreamSessions(grace_seconds=0.05)
+        started = asyncio.Event()
+        session = sessions.start("user-1", _endless(started))
+        stream = session.subscribe()
+        await anext(stream)
+        await started.wait()
+        await stream.aclose()
+
+        # Still resumable within the grace period
+        await asyncio.sleep(0.01)
+        assert not session.task.done()
+        assert sessions.resume("user-1", f"{session.key}:1") is not None
+
+        await asyncio.sleep(0.1)
+        assert session.task.cancelled()
+        assert sessions.resume("user-1", f"{session.key}:1") is None
+        return sessions.stats()
+
+    assert asyncio.run(run())["active"] == 0
@@ -1,5 +1,57 @@
+import csv
+import io
+import os
+
+from utils.tokenizer import truncate_tokens
+
+# "compact" (CSV rows, short ids, rounded coordinates, budgeted descriptions) or "verbose" (the original layout)
+PROMPT_ENCODING = os.getenv("PROMPT_ENCODING", "compact")
+# Tokens shared by all descriptions in a compact prompt, and the most any one description gets
+PROMPT_DESCRIPTION_TOKEN_BUDGET = int(os.getenv("PROMPT_DESCRIPTION_TOKEN_BUDGET", "2000"))
+PROMPT_DESCRIPTION_MAX_TOKENS = int(os.getenv("PROMPT_DESCRIPTION_MAX_TOKENS", "40"))
+# 4 decimals is about 11 m, finer than any commute estimate needs
+COORDINATE_DECIMALS = 4
+
+COMPACT_COLUMNS = ["id", "name", "minutes", "lat", "lon", "about"]
+COMPACT_LEGEND = "Activities as CSV, use the id column as the activity_id:"
+
+
 def format_activity(activity_list):
     formatted_activity_string=""
     for i,activity in enumerate(activity_list):
         formatted_activity_string+=f"{i+1}. {activity['name']} ({activity['description']}, duration:{activity['duration']} minutes, latitude:{activity['latitude']}, longitude:{activity['longitude']} ,activity_id:{activity['id']})\n"
     return formatted_activity_string
+
+
+def format_activity_compact(activity_list, description_budget=PROMPT_DESCRIPTION_TOKEN_BUDGET, description_max_tokens=PROMPT_DESCRIPTION_MAX_TOKENS):
+    """
+    CSV encoding of the activities with short local ids (1, 2, ...), coordinates rounded to COORDINATE_DECIMALS
+    and descriptions truncated so all of them together stay within description_budget tokens.
+    Returns the table and the local ids in activity order, for mapping the model's ids back.
+    """
+    per_description = min(description_max_tokens, description_budget // max(len(activity_list), 1))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(COMPACT_COLUMNS)
+    local_ids = []
+    for i, activity in enumerate(activity_list):
+        local_ids.append(str(i + 1))
+        writer.writerow([
+            local_ids[-1],
+            activity['name'],
+            activity['duration'],
+            round(float(activity['latitude']), COORDINATE_DECIMALS),
+            round(float(activity['longitude']), COORDINATE_DECIMALS),
+            truncate_tokens(" ".join(str(activity['description']).split()), per_description),
+        ])
+    return f"{COMPACT_LEGEND}\n{buffer.getvalue()}", local_ids
+
+
+def encode_activities(activity_list, encoding=PROMPT_ENCODING):
+    """
+    The activities as they go into the itinerary prompt, with the id each one is referred to by there.
+    Verbose prompts use the real activity ids, compact ones short local ids.
+    """
+    if encoding == "verbose":
+        return format_activity(activity_list), [str(activity['id']) for activity in activity_list]
+    return format_activity_compact(activity_list)
@@ -0,0 +1,213 @@
+import math
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import get_args
+
+from models.ActivityModels import CategoryType
+
+CATEGORIES = get_args(CategoryType.model_fields['category_type'].annotation)
+
+CATEGORY_CONFIDENCE_THRESHOLD = float(os.getenv("CATEGORY_CONFIDENCE_THRESHOLD", "0.6"))
+
+# Below this char-n-gram similarity a word is treated as unknown rather than a misspelling or inflection
+FUZZY_MATCH_MIN_SIMILARITY = 0.65
+# A fuzzy match must also keep the term's first letters and be this close in edits (per 4 letters, at least 1),
+# similar n-grams alone pair "hopping" with "shopping" and "cart" with "art"
+FUZZY_MATCH_PREFIX = 2
+FUZZY_MATCH_LETTERS_PER_EDIT = 4
+# A word that only matched fuzzily explains this much of itself, the rest is left to the LLM
+FUZZY_MATCH_WEIGHT = 0.5
+NGRAM_SIZES = (3, 4)
+
+# Keyword/synonym lexicon, a term may point at several categories the same way the LLM is told to "infer loosely"
+LEXICON = {
+    "Fitness": ["fitness", "gym", "workout", "exercise", "running", "jogging", "marathon", "cycling", "sports", "yoga", "swimming"],
+    "Sensory": ["sensory", "music", "concert", "light show", "sound", "aroma", "perfume", "tasting", "senses", "fragrance"],
+    "Food & Drink": ["food", "eat", "eating", "restaurant", "cafe", "coffee", "drinks", "bar", "pub", "brewery", "wine",
+                     "cocktail", "dining", "dinner", "lunch", "breakfast", "dessert", "bakery", "foodie", "street food"],
+    "Art": ["art", "arts", "gallery", "painting", "sculpture", "craft", "crafts", "exhibition", "theatre", "theater", "artistic"],
+    "History": ["history", "historical", "historic", "museum", "fort", "monument", "ruins", "palace", "archaeological",
+                "memorial", "ancient"],
+    "Accommodation": ["hotel", "stay", "resort", "homestay", "hostel", "accommodation", "lodge", "villa", "camping"],
+    "Spiritual": ["temple", "mosque", "church", "gurudwara", "shrine", "monastery", "spiritual", "pilgrimage", "meditation",
+                  "prayer", "ashram", "religious", "cathedral"],
+    "Retail Therapy": ["shopping", "shop", "market", "mall", "bazaar", "boutique", "souvenir", "flea market"],
+    "Water Sports": ["surfing", "snorkeling", "snorkelling", "scuba", "diving", "kayaking", "rafting", "jet ski", "swimming",
+                     "sailing", "boating", "parasailing", "water sports", "beach"],
+    "Local Experience": ["local", "locals", "village", "homestay", "authentic", "street food", "neighbourhood",
+                         "neighborhood", "community", "offbeat"],
+    "Patriotic": ["patriotic", "independence", "war memorial", "freedom", "national", "flag", "parade", "martyrs", "army"],
+    "Relaxation": ["relax", "relaxing", "relaxation", "chill", "calm", "peaceful", "spa", "beach", "unwind", "laid back",
+                   "quiet", "slow", "lazy"],
+    "Educational": ["learn", "learning", "educational", "workshop", "class", "science", "planetarium", "lecture", "course",
+                    "museum", "cooking class"],
+    "Recreational": ["amusement", "theme park", "park", "games", "bowling", "zoo", "aquarium", "water park", "fun", "kids",
+                     "family", "recreation"],
+    "Sightseeing": ["sightseeing", "views", "viewpoint", "landmarks", "scenic", "attractions", "city tour", "photography",
+                    "sunset", "sunrise", "monument", "panoramic", "sights"],
+    "Food & Culture": ["street food", "cuisine", "culinary", "cooking class", "food tour", "traditional food", "local food",
+                       "food", "foodie", "delicacies"],
+    "Nature": ["nature", "hills", "mountains", "mountain", "forest", "wildlife", "lake", "waterfall", "garden", "beach",
+               "trekking", "national park", "outdoors", "birdwatching", "greenery", "valley", "river"],
+    "Adventure": ["adventure", "trek", "trekking", "hike", "hiking", "climbing", "bungee", "paragliding", "zipline", "rafting",
+                  "safari", "camping", "thrill", "skydiving", "adrenaline", "adventurous"],
+    "Wellness": ["wellness", "spa", "massage", "yoga", "ayurveda", "meditation", "detox", "retreat", "healing"],
+    "Cultural": ["culture", "cultural", "festival", "dance", "tradition", "traditional", "folk", "temple", "art", "heritage walk"],
+    "Leisure": ["leisure", "casual", "easy", "stroll", "leisurely", "cruise", "picnic", "nightlife", "club", "clubbing"],
+    "Heritage": ["heritage", "unesco", "old city", "fort", "palace", "colonial", "architecture", "ancient", "monument",
+                 "heritage walk"],
+}
+
+# Words that carry no category signal, excluded from the confidence denominator
+STOP_WORDS = frozenset("""
+a an the and or but of to in on at for with from by as is are be am was were i me my we our us you your it its this that
+these those some any lots lot of few many more most much very really also just want wants would like love loves enjoy
+prefer interested into trip travel travelling traveling vacation holiday visit visiting see seeing explore exploring
+experience experiences things thing place places spot spots day days time around do doing go going get have has maybe
+plus bit kind sort type types good great nice best
+""".split())
+
+# Words that flip the meaning of what follows ("no museums", "don't like crowds"), a keyword match can't tell
+# wanted from unwanted so these descriptions are left to the LLM. Apostrophes split words, so any n't contraction
+# leaves a lone "t" behind
+NEGATION_CUES = frozenset("""
+no not never nor neither nothing none without except avoid avoiding hate hates dislike dislikes t dont doesnt didnt
+isnt arent wont cant
+""".split())
+
+_WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def _ngrams(term):
+    padded = f" {term} "
+    return [padded[i:i + size] for size in NGRAM_SIZES for i in range(len(padded) - size + 1)]
+
+
+def _build_index():
+    term_categories = defaultdict(set)
+    for category, terms in LEXICON.items():
+        for term in terms:
+            term_categories[term].add(category)
+
+    # IDF over lexicon terms, then an inverted index n-gram -> [(term, weight)] of L2-normalized TF-IDF vectors
+    document_frequency = defaultdict(int)
+    term_grams = {}
+    for term in term_categories:
+        grams = _ngrams(term)
+        term_grams[term] = grams
+        for gram in set(grams):
+            document_frequency[gram] += 1
+    idf = {gram: math.log((1 + len(term_grams)) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+
+    index = defaultdict(list)
+    for term, grams in term_grams.items():
+        vector = _tfidf(grams, idf)
+        for gram, weight in vector.items():
+            index[gram].append((term, weight))
+    return dict(term_categories), idf, dict(index)
+
+
+def _tfidf(grams, idf):
+    counts = defaultdict(int)
+    for gram in grams:
+        if gram in idf:
+            counts[gram] += 1
+    vector = {gram: count * idf[gram] for gram, count in counts.items()}
+    norm = math.sqrt(sum(weight * weight for weight in vector.values())) or 1.0
+    return {gram: weight / norm for gram, weight in vector.items()}
+
+
+_TERM_CATEGORIES, _IDF, _INDEX = _build_index()
+_PHRASE_LENGTHS = sorted({len(term.split()) for term in _TERM_CATEGORIES}, reverse=True)
+
+
+def _singular(word):
+    for suffix, replacement in (("ies", "y"), ("es", ""), ("s", "")):
+        if word.endswith(suffix) and word[:-len(suffix)] + replacement in _TERM_CATEGORIES:
+            return word[:-len(suffix)] + replacement
+    return None
+
+
+def _edit_distance(word, other):
+    """Optimal string alignment distance, a swap of two adjacent letters counts as one edit."""
+    previous, current = None, list(range(len(other) + 1))
+    for i in range(1, len(word) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(other)
+        for j in range(1, len(other) + 1):
+            cost = word[i - 1] != other[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and word[i - 1] == other[j - 2] and word[i - 2] == other[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+def _is_variant(word, term):
+    """Whether an unknown word reads as a misspelling or inflection of a lexicon term."""
+    if word[:FUZZY_MATCH_PREFIX] != term[:FUZZY_MATCH_PREFIX]:
+        return False
+    return _edit_distance(word, term) <= max(1, len(term) // FUZZY_MATCH_LETTERS_PER_EDIT)
+
+
+@lru_cache(maxsize=4096)
+def _closest_term(word):
+    """Closest lexicon term to an unknown word by char-n-gram TF-IDF cosine, as (term, similarity)."""
+    scores = defaultdict(float)
+    for gram, weight in _tfidf(_ngrams(word), _IDF).items():
+        for term, term_weight in _INDEX.get(gram, ()):
+            scores[term] += weight * term_weight
+    if not scores:
+        return None, 0.0
+    term = max(scores, key=scores.get)
+    return term, scores[term]
+
+
+def classify_description(description):
+    """
+    Maps a trip description onto the closed category set without calling the LLM.
+    Returns (categories, confidence), where confidence is the share of meaningful words the lexicon could explain
+    (misspellings at a reduced weight).
+    A description with a negation gets no confidence, as its keywords may be the things the user doesn't want.
+    """
+    words = _WORD_PATTERN.findall(description.lower())
+    category_scores = defaultdict(float)
+    explained = 0.0
+    content_words = 0
+
+    i = 0
+    while i < len(words):
+        for length in _PHRASE_LENGTHS:
+            phrase = " ".join(words[i:i + length])
+            if length > 1 and phrase in _TERM_CATEGORIES:
+                for category in _TERM_CATEGORIES[phrase]:
+                    category_scores[category] += 1.0
+                explained += length
+                content_words += length
+                i += length
+                break
+        else:
+            word = words[i]
+            i += 1
+            if word in STOP_WORDS or len(word) < 3:
+                continue
+            content_words += 1
+            if word in _TERM_CATEGORIES:
+                term, similarity = word, 1.0
+            elif _singular(word):
+                term, similarity = _singular(word), 1.0
+            else:
+                term, similarity = _closest_term(word)
+                if similarity < FUZZY_MATCH_MIN_SIMILARITY or not _is_variant(word, term):
+                    continue
+                similarity *= FUZZY_MATCH_WEIGHT
+            for category in _TERM_CATEGORIES[term]:
+                category_scores[category] += similarity
+            explained += similarity
+
+    if not content_words or not category_scores:
+        return [], 0.0
+    categories = sorted(category_scores, key=lambda category: (-category_scores[category], CATEGORIES.index(category)))
+    if any(word in NEGATION_CUES for word in words):
+        return categories, 0.0
+    return categories, explained / content_words
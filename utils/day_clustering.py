@@ -0,0 +1,98 @@
+import math
+import os
+
+import numpy as np
+
+from utils.route_solver import MAX_ACTIVITIES_PER_DAY, duration_minutes, haversine_cross, haversine_matrix, solve_route
+
+# Activity time a day can hold, leaving room in the 8:00-23:59 window for commutes, meals and rest
+DAY_BUDGET_MINUTES = int(os.getenv("DAY_BUDGET_MINUTES", "600"))
+KMEANS_MAX_ITERATIONS = 25
+
+
+def _kmeans_plus_plus(latitudes, longitudes, k, rng):
+    centers = [int(rng.integers(len(latitudes)))]
+    closest = haversine_cross(latitudes, longitudes, latitudes[centers], longitudes[centers]).min(axis=1)
+    for _ in range(1, k):
+        weights = closest ** 2
+        total = weights.sum()
+        center = int(rng.choice(len(latitudes), p=weights / total)) if total > 0 else int(rng.integers(len(latitudes)))
+        centers.append(center)
+        closest = np.minimum(closest, haversine_cross(latitudes, longitudes, latitudes[[center]], longitudes[[center]])[:, 0])
+    return latitudes[centers].copy(), longitudes[centers].copy()
+
+
+def _assign(dist, durations, max_per_day, budget):
+    """
+    Capacity-constrained assignment: points with the most to lose (largest gap between their best and
+    second-best day) pick first, each taking its nearest day that still has room.
+    """
+    n, k = dist.shape
+    ranked = np.argsort(dist, axis=1)
+    if k > 1:
+        sorted_dist = np.take_along_axis(dist, ranked[:, :2], axis=1)
+        order = np.argsort(sorted_dist[:, 0] - sorted_dist[:, 1])
+    else:
+        order = np.arange(n)
+
+    labels = np.empty(n, dtype=int)
+    counts = np.zeros(k, dtype=int)
+    minutes = np.zeros(k)
+    for i in order:
+        for day in ranked[i]:
+            if counts[day] < max_per_day and (counts[day] == 0 or minutes[day] + durations[i] <= budget):
+                break
+        else:
+            # No day has minutes left: the nearest day with an open slot goes over its budget, only when every
+            # day is at the activity limit does the lightest one go over that rather than dropping the activity
+            open_days = [day for day in ranked[i] if counts[day] < max_per_day]
+            day = open_days[0] if open_days else int(np.argmin(minutes))
+        labels[i] = day
+        counts[day] += 1
+        minutes[day] += durations[i]
+    return labels
+
+
+def cluster_days(activity_list, max_per_day=MAX_ACTIVITIES_PER_DAY, day_budget_minutes=DAY_BUDGET_MINUTES, seed=0):
+    """
+    Groups activities into days by location, before any LLM call.
+    Capacity-constrained k-means on haversine distances, with as many days as the activities-per-day limit and
+    the per-day duration budget require. Days are ordered along the shortest route through their centroids,
+    activities within a day along the shortest route through the day.
+    Returns a list of days, each a list of indices into activity_list.
+    """
+    n = len(activity_list)
+    if n == 0:
+        return []
+    latitudes = np.array([float(activity['latitude']) for activity in activity_list])
+    longitudes = np.array([float(activity['longitude']) for activity in activity_list])
+    durations = np.array([duration_minutes(activity) for activity in activity_list], dtype=float)
+
+    k = max(math.ceil(n / max_per_day), math.ceil(durations.sum() / day_budget_minutes), 1)
+    k = min(k, n)
+
+    rng = np.random.default_rng(seed)
+    center_lat, center_lon = _kmeans_plus_plus(latitudes, longitudes, k, rng)
+    labels = None
+    for _ in range(KMEANS_MAX_ITERATIONS):
+        dist = haversine_cross(latitudes, longitudes, center_lat, center_lon)
+        new_labels = _assign(dist, durations, max_per_day, day_budget_minutes)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+        for day in range(k):
+            members = labels == day
+            if members.any():
+                center_lat[day] = latitudes[members].mean()
+                center_lon[day] = longitudes[members].mean()
+
+    days = [np.flatnonzero(labels == day) for day in range(k)]
+    used = [day for day in range(k) if len(days[day])]
+    day_order = [used[i] for i in solve_route(haversine_matrix(center_lat[used], center_lon[used]))]
+
+    ordered = []
+    for day in day_order:
+        members = days[day]
+        route = solve_route(haversine_matrix(latitudes[members], longitudes[members]))
+        ordered.append([int(members[i]) for i in route])
+    return ordered
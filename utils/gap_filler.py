@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+from models.ItineraryModels import ItineraryStreamItem
+from utils.route_solver import (DAY_END_MINUTES, DEFAULT_DURATION_MINUTES, REST_AFTER_MINUTES, REST_MINUTES, duration_minutes,
+                                haversine_cross, travel_minutes)
+
+# Free time shorter than this is left as slack instead of becoming a rest row
+MIN_REST_GAP_MINUTES = 15
+
+
+class GapFiller:
+    """
+    Post-processing stage between the model and the stream: the model only writes the real activities, and this
+    inserts the commute and rest rows around them as they arrive.
+
+    Commutes use the haversine distance between consecutive activities and the route solver's speed model, free
+    time becomes a rest row, and a rest is forced once REST_AFTER_MINUTES of activities have piled up without one.
+    Activities that overlap the previous item or arrive out of order are pushed back until they fit.
+    A later activity on a later date starts a new day, unless the filler is pinned to one day: then every item is
+    moved onto that date at the time of day the model gave it, and what doesn't fit before midnight is cut short.
+    """
+
+    def __init__(self, activity_list, day=None):
+        self.activities = {str(activity['id']): activity for activity in activity_list}
+        self.day = day
+        self.previous = None
+        self.clock = None
+        self.since_rest = 0
+
+    def feed(self, item):
+        """Takes one item from the model, returning it with corrected times preceded by any inserted rows."""
+        if item['activity_type'] in ("rest", "commute"):
+            # The prompt no longer asks for these, anything the model still writes is replaced by our own rows
+            return []
+
+        activity = self.activities.get(str(item['activity_id']))
+        # The itinerary is in local time, an offset the model adds can't be compared with the naive times
+        start = datetime.fromisoformat(item['start_time']).replace(tzinfo=None)
+        duration = datetime.fromisoformat(item['end_time']).replace(tzinfo=None) - start
+        if duration <= timedelta(0):
+            duration = timedelta(minutes=duration_minutes(activity) if activity is not None else DEFAULT_DURATION_MINUTES)
+        if self.day is not None:
+            start = datetime.combine(self.day, start.time())
+
+        filled = []
+        if self.clock is not None and start.date() <= self.clock.date():
+            commute = timedelta(minutes=self._commute_minutes(self.previous, activity))
+            rest_start = self.clock
+            if self.since_rest >= REST_AFTER_MINUTES:
+                start = max(start, self.clock + timedelta(minutes=REST_MINUTES) + commute)
+            start = max(start, self.clock + commute)
+            start, end = self._fit(start, duration)
+
+            rest_end = max(start - commute, self.clock)
+            if rest_end - rest_start >= timedelta(minutes=MIN_REST_GAP_MINUTES):
+                filled.append(self._row("Rest", "rest", rest_start, rest_end, f"rest-{self._id(self.previous)}-{item['activity_id']}"))
+                self.since_rest = 0
+            if start > rest_end:
+                name = activity['name'] if activity is not None else item['activity_name']
+                filled.append(self._row(f"Commute to {name}", "commute", rest_end, start, f"commute-{self._id(self.previous)}-{item['activity_id']}"))
+        else:
+            start, end = self._fit(start, duration)
+            self.since_rest = 0
+
+        filled.append(self._row(item['activity_name'], item['activity_type'], start, end, item['activity_id']))
+        self.previous = activity
+        self.clock = end
+        self.since_rest += duration.total_seconds() / 60
+        return filled
+
+    def _fit(self, start, duration):
+        """Start and end of an activity, squeezed into the pinned day when it would run past its end."""
+        end = start + duration
+        if self.day is not None:
+            day_end = datetime.combine(self.day, datetime.min.time()) + timedelta(minutes=DAY_END_MINUTES)
+            start, end = min(start, day_end), min(end, day_end)
+        return start, end
+
+    def _commute_minutes(self, origin, destination):
+        if origin is None or destination is None:
+            return 0
+        distance = haversine_cross([float(origin['latitude'])], [float(origin['longitude'])],
+                                   [float(destination['latitude'])], [float(destination['longitude'])])
+        return int(travel_minutes(distance)[0, 0])
+
+    @staticmethod
+    def _id(activity):
+        return activity['id'] if activity is not None else "start"
+
+    @staticmethod
+    def _row(name, activity_type, start, end, activity_id):
+        return ItineraryStreamItem(
+            activity_name=name,
+            activity_type=activity_type,
+            start_time=start,
+            end_time=end,
+            activity_id=activity_id,
+        ).model_dump(mode="json")
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+ITINERARY_CACHE_TTL_SECONDS = float(os.getenv("ITINERARY_CACHE_TTL_SECONDS", str(60 * 60)))
+ITINERARY_CACHE_MAX_ENTRIES = int(os.getenv("ITINERARY_CACHE_MAX_ENTRIES", "512"))
+
+
+def activity_fingerprint(activity_list, prompt_version):
+    """Stable hash of the activity set (ids, durations, coordinates) and the prompt that plans it."""
+    rows = sorted(
+        (str(activity['id']), str(activity['duration']), round(float(activity['latitude']), 6), round(float(activity['longitude']), 6))
+        for activity in activity_list
+    )
+    payload = json.dumps([prompt_version, rows], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ItineraryGeneration:
+    """
+    A single in-flight itinerary generation.
+    The producer runs in its own task, independent of any one client, and every subscriber first replays
+    the items produced so far and then follows the live stream.
+    """
+
+    def __init__(self, producer):
+        self.items = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run(producer))
+
+    async def _run(self, producer):
+        try:
+            async for item in producer:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self):
+        index = 0
+        while True:
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._changed.wait()
+
+
+class ItineraryResultCache:
+    """
+    Finished itineraries keyed by activity fingerprint, with single-flight generation on a miss:
+    concurrent requests for the same fingerprint subscribe to one shared ItineraryGeneration.
+    """
+
+    def __init__(self, ttl_seconds=ITINERARY_CACHE_TTL_SECONDS, max_entries=ITINERARY_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, fingerprint):
+        entry = self._results.get(fingerprint)
+        if entry is None:
+            return None
+        items, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._results[fingerprint]
+            return None
+        self._results.move_to_end(fingerprint)
+        return items
+
+    def put(self, fingerprint, items):
+        self._results[fingerprint] = (list(items), time.monotonic() + self.ttl_seconds)
+        self._results.move_to_end(fingerprint)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def available(self, fingerprint):
+        """Whether streaming this fingerprint starts no generation, as it's cached or already being generated."""
+        return self.get(fingerprint) is not None or fingerprint in self._inflight
+
+    def generation(self, fingerprint, producer_factory):
+        """The in-flight generation for a fingerprint, started from producer_factory() if there is none."""
+        generation = self._inflight.get(fingerprint)
+        if generation is not None:
+            self.coalesced += 1
+            return generation
+        generation = ItineraryGeneration(producer_factory())
+        self._inflight[fingerprint] = generation
+        generation.task.add_done_callback(lambda _: self._finish(fingerprint, generation))
+        return generation
+
+    async def stream(self, fingerprint, producer_factory):
+        """Yields the itinerary items for a fingerprint, from the cache when possible."""
+        items = self.get(fingerprint)
+        if items is not None:
+            self.hits += 1
+            for item in items:
+                yield item
+            return
+        self.misses += 1
+        async for item in self.generation(fingerprint, producer_factory).subscribe():
+            yield item
+
+    def invalidate(self, fingerprint):
+        self._results.pop(fingerprint, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._results),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _finish(self, fingerprint, generation):
+        if self._inflight.get(fingerprint) is generation:
+            del self._inflight[fingerprint]
+        if generation.error is None and generation.items and not generation.task.cancelled():
+            self.put(fingerprint, generation.items)
@@ -0,0 +1,113 @@
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from utils.route_solver import MAX_ACTIVITIES_PER_DAY, haversine_cross
+
+ITINERARY_PLAN_MAX_USERS = int(os.getenv("ITINERARY_PLAN_MAX_USERS", "4096"))
+# Edits touching more than this share of the activities are planned from scratch
+REPLAN_MAX_CHANGED_FRACTION = float(os.getenv("REPLAN_MAX_CHANGED_FRACTION", "0.3"))
+
+
+def item_date(item):
+    return datetime.fromisoformat(item['start_time']).date()
+
+
+def _signature(activity):
+    return str(activity['duration']), round(float(activity['latitude']), 6), round(float(activity['longitude']), 6)
+
+
+class ItineraryPlan:
+    """The last itinerary streamed to a user, with the activities it was planned from."""
+
+    def __init__(self, fingerprint, activity_list, items):
+        self.fingerprint = fingerprint
+        self.activities = {str(activity['id']): activity for activity in activity_list}
+        self.items = list(items)
+
+    def days(self):
+        """Activity ids placed on each date, in itinerary order."""
+        days = {}
+        for item in self.items:
+            activity_id = str(item['activity_id'])
+            days.setdefault(item_date(item), [])
+            if activity_id in self.activities:
+                days[item_date(item)].append(activity_id)
+        return days
+
+    def items_on(self, day):
+        return [item for item in self.items if item_date(item) == day]
+
+    def changed_days(self, items):
+        """Dates, in order, on which another itinerary for the same trip differs from this plan."""
+        before, after = {}, {}
+        for item in self.items:
+            before.setdefault(item_date(item), []).append(item)
+        for item in items:
+            after.setdefault(item_date(item), []).append(item)
+        return sorted(day for day in before.keys() | after.keys() if before.get(day) != after.get(day))
+
+    def replan(self, activity_list, max_per_day=MAX_ACTIVITIES_PER_DAY, max_changed_fraction=REPLAN_MAX_CHANGED_FRACTION):
+        """
+        Diffs a new activity list against this plan and returns {date: activities} for the days that have to be
+        regenerated, or None when the edit is too large and a full plan is the better deal.
+        Removed and changed activities mark their own day, added ones join the nearest day with room (or a new
+        day after the last one). A day emptied by removals maps to an empty list and is left free rather than
+        shifting every later day.
+        """
+        current = {str(activity['id']): activity for activity in activity_list}
+        days = self.days()
+        day_of = {activity_id: day for day, activity_ids in days.items() for activity_id in activity_ids}
+
+        removed = [activity_id for activity_id in self.activities if activity_id not in current]
+        changed = [activity_id for activity_id in current
+                   if activity_id in day_of and _signature(current[activity_id]) != _signature(self.activities[activity_id])]
+        # Anything the previous itinerary never placed is treated as new, whatever the model did with it
+        added = [activity_id for activity_id in current if activity_id not in day_of]
+        if not days or len(removed) + len(changed) + len(added) > max_changed_fraction * len(current):
+            return None
+
+        members = {day: [activity_id for activity_id in activity_ids if activity_id in current] for day, activity_ids in days.items()}
+        affected = {day_of[activity_id] for activity_id in removed + changed if activity_id in day_of}
+        for activity_id in added:
+            day = self._nearest_day(current, members, current[activity_id], max_per_day)
+            members.setdefault(day, []).append(activity_id)
+            affected.add(day)
+        return {day: [current[activity_id] for activity_id in members[day]] for day in sorted(affected)}
+
+    @staticmethod
+    def _nearest_day(current, members, activity, max_per_day):
+        open_days = [day for day, activity_ids in members.items() if activity_ids and len(activity_ids) < max_per_day]
+        if not open_days:
+            return max(members) + timedelta(days=1)
+        centroids = np.array([
+            [np.mean([float(current[activity_id][field]) for activity_id in members[day]]) for field in ("latitude", "longitude")]
+            for day in open_days
+        ])
+        distances = haversine_cross([float(activity['latitude'])], [float(activity['longitude'])], centroids[:, 0], centroids[:, 1])
+        return open_days[int(distances.argmin())]
+
+
+class ItineraryPlanStore:
+    """The last plan per user, least recently used users are dropped first."""
+
+    def __init__(self, max_users=ITINERARY_PLAN_MAX_USERS):
+        self.max_users = max_users
+        self._plans = OrderedDict()
+
+    def get(self, user_id):
+        plan = self._plans.get(user_id)
+        if plan is not None:
+            self._plans.move_to_end(user_id)
+        return plan
+
+    def put(self, user_id, plan):
+        self._plans[user_id] = plan
+        self._plans.move_to_end(user_id)
+        while len(self._plans) > self.max_users:
+            self._plans.popitem(last=False)
+
+    def invalidate(self, user_id):
+        self._plans.pop(user_id, None)
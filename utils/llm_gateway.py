@@ -0,0 +1,251 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+
+import openai
+from langchain_openai import ChatOpenAI
+
+from utils.metrics import LLM_ACTIVE, LLM_QUEUED, LLM_QUEUE_WAIT_SECONDS, LLM_REJECTED, LLM_RETRIES
+
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "16"))
+# Budget for prompt plus expected output tokens, 0 turns the budget off
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000"))
+LLM_OUTPUT_TOKEN_ALLOWANCE = int(os.getenv("LLM_OUTPUT_TOKEN_ALLOWANCE", "1000"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "256"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+
+# Lower ranks are admitted first
+PRIORITIES = {"interactive": 0, "batch": 1, "precompute": 2}
+# How long a call may wait for admission before it is shed
+QUEUE_DEADLINE_SECONDS = {
+    "interactive": float(os.getenv("LLM_INTERACTIVE_QUEUE_DEADLINE_SECONDS", "10")),
+    "batch": float(os.getenv("LLM_BATCH_QUEUE_DEADLINE_SECONDS", "300")),
+    "precompute": float(os.getenv("LLM_PRECOMPUTE_QUEUE_DEADLINE_SECONDS", "600")),
+}
+
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+class LLMOverloaded(Exception):
+    """The gateway shed a call, either because the queue was full or because its wait passed the deadline."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"LLM capacity exhausted, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def estimate_tokens(messages, prompt_tokens=None):
+    """Prompt tokens (at 4 characters per token unless the caller counted them), plus the output allowance."""
+    if prompt_tokens is None:
+        prompt_tokens = sum(len(message.content) for message in messages) // 4
+    return prompt_tokens + LLM_OUTPUT_TOKEN_ALLOWANCE
+
+
+class _Waiter:
+    __slots__ = ("rank", "order", "tokens", "future", "queued_at", "priority")
+
+    def __init__(self, rank, order, tokens, future, priority):
+        self.rank = rank
+        self.order = order
+        self.tokens = tokens
+        self.future = future
+        self.queued_at = time.monotonic()
+        self.priority = priority
+
+    def __lt__(self, other):
+        return (self.rank, self.order) < (other.rank, other.order)
+
+
+class LLMGateway:
+    """
+    The one way the API talks to OpenAI.
+    Model clients are shared per configuration, and every call is admitted through a priority queue that enforces
+    a global limit on concurrent calls and a tokens-per-minute budget (a token bucket refilled continuously).
+    The head of the queue is never overtaken, so interactive calls aren't starved by a burst of batch work behind
+    them. A call that can't be queued, or whose wait passes its priority's deadline, fails fast with LLMOverloaded
+    instead of slowing everyone down. Rate limits and transient errors are retried with jittered backoff.
+    """
+
+    def __init__(self, max_concurrent=LLM_MAX_CONCURRENT, tokens_per_minute=LLM_TOKENS_PER_MINUTE, max_queue=LLM_MAX_QUEUE,
+                 deadlines=QUEUE_DEADLINE_SECONDS, max_retries=LLM_MAX_RETRIES, retry_base_seconds=LLM_RETRY_BASE_SECONDS,
+                 retry_max_seconds=LLM_RETRY_MAX_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.tokens_per_minute = tokens_per_minute
+        self.max_queue = max_queue
+        self.deadlines = deadlines
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.active = 0
+        self._waiters = []
+        self._order = itertools.count()
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+        self._timer = None
+        # Moving average of how long a call holds its slot, for Retry-After estimates
+        self._hold_seconds = 1.0
+        self._models = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.retries = 0
+
+    def model(self, **kwargs):
+        """A shared client for this configuration, retries are left to the gateway."""
+        key = tuple(sorted(kwargs.items()))
+        model = self._models.get(key)
+        if model is None:
+            model = self._models[key] = ChatOpenAI(max_retries=0, **kwargs)
+        return model
+
+    def reset_models(self):
+        self._models.clear()
+
+    async def invoke(self, runnable, messages, priority="interactive"):
+        async with self.slot(estimate_tokens(messages), priority):
+            for attempt in itertools.count():
+                try:
+                    return await runnable.ainvoke(messages)
+                except RETRYABLE_ERRORS:
+                    if attempt >= self.max_retries:
+                        raise
+                    await self._backoff(attempt)
+
+    async def stream(self, model, messages, priority="interactive", prompt_tokens=None, on_admitted=None):
+        """Streams the model's chunks once admitted, on_admitted is called as the slot is granted."""
+        async with self.slot(estimate_tokens(messages, prompt_tokens), priority):
+            if on_admitted is not None:
+                on_admitted()
+            for attempt in itertools.count():
+                streamed = False
+                try:
+                    async for chunk in model.astream(messages):
+                        streamed = True
+                        yield chunk
+                    return
+                except RETRYABLE_ERRORS:
+                    # Only a stream that failed before its first chunk can be retried without the caller noticing
+                    if streamed or attempt >= self.max_retries:
+                        raise
+                    await self._backoff(attempt)
+
+    def saturated(self, priority="interactive"):
+        """Whether a call at this priority would be shed right away."""
+        return self._queued(PRIORITIES[priority]) >= self.max_queue
+
+    def retry_after(self, priority="interactive"):
+        ahead = self._queued(PRIORITIES[priority])
+        return max(1, math.ceil(self._hold_seconds * (ahead + 1) / self.max_concurrent))
+
+    def stats(self):
+        self._refill()
+        return {
+            "active": self.active,
+            "queued": {priority: sum(1 for waiter in self._waiters if waiter.rank == rank and not waiter.future.done())
+                       for priority, rank in PRIORITIES.items()},
+            "tokens_available": int(self._tokens),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "retries": self.retries,
+        }
+
+    @asynccontextmanager
+    async def slot(self, tokens, priority="interactive"):
+        await self._acquire(tokens, priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * (time.monotonic() - started)
+            self._release()
+
+    async def _acquire(self, tokens, priority):
+        rank = PRIORITIES[priority]
+        if self._queued(rank) >= self.max_queue:
+            self.rejected += 1
+            LLM_REJECTED.inc(priority=priority, reason="queue_full")
+            raise LLMOverloaded(self.retry_after(priority))
+
+        loop = asyncio.get_running_loop()
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+        waiter = _Waiter(rank, next(self._order), tokens, loop.create_future(), priority)
+        heapq.heappush(self._waiters, waiter)
+        deadline = loop.call_later(self.deadlines[priority], self._expire, waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            # Admitted just as the caller went away, hand the slot back
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self._release()
+            raise
+        finally:
+            deadline.cancel()
+            LLM_QUEUE_WAIT_SECONDS.observe(time.monotonic() - waiter.queued_at, priority=priority)
+            self._update_gauges()
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def _expire(self, waiter):
+        if not waiter.future.done():
+            self.timed_out += 1
+            LLM_REJECTED.inc(priority=waiter.priority, reason="deadline")
+            waiter.future.set_exception(LLMOverloaded(self.retry_after(waiter.priority)))
+            self._dispatch()
+
+    def _dispatch(self):
+        self._refill()
+        while self._waiters and self.active < self.max_concurrent:
+            waiter = self._waiters[0]
+            if waiter.future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if waiter.tokens > self._tokens:
+                # The head waits for the budget to refill, nothing behind it is admitted in the meantime
+                if self._timer is None:
+                    delay = (waiter.tokens - self._tokens) / (self.tokens_per_minute / 60)
+                    self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+                break
+            heapq.heappop(self._waiters)
+            self._tokens -= waiter.tokens
+            self.active += 1
+            self.admitted += 1
+            waiter.future.set_result(None)
+        self._update_gauges()
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.tokens_per_minute:
+            self._tokens = min(float(self.tokens_per_minute), self._tokens + (now - self._refilled_at) * self.tokens_per_minute / 60)
+        self._refilled_at = now
+
+    def _queued(self, rank):
+        """Waiting calls that would be admitted before a new one at this rank."""
+        return sum(1 for waiter in self._waiters if waiter.rank <= rank and not waiter.future.done())
+
+    async def _backoff(self, attempt):
+        self.retries += 1
+        LLM_RETRIES.inc()
+        # Full jitter, so calls that failed together don't retry together
+        await asyncio.sleep(random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt)))
+
+    def _update_gauges(self):
+        LLM_ACTIVE.set(self.active)
+        LLM_QUEUED.set(sum(1 for waiter in self._waiters if not waiter.future.done()))
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,187 @@
+import math
+import threading
+from collections import defaultdict
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (1, 5, 10, 20, 50, 100, 200, 500, 1000)
+SIZE_BUCKETS = (250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+def _label_text(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = defaultdict(float)
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._values[self._key(labels)] += amount
+
+    def _samples(self):
+        with self._lock:
+            return [f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}" for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """A gauge either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self.callback = callback
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self):
+        if self.callback is not None:
+            # The callback returns {label value tuple: value}, or a bare number for an unlabelled gauge
+            values = self.callback()
+            values = values if isinstance(values, dict) else {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_number(value)}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts = {}
+        self._sums = defaultdict(float)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[key] += value
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            for key, counts in self._counts.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    samples.append(f"{self.name}_bucket{_label_text(self.labelnames, key, [('le', _number(bound))])} {cumulative}")
+                samples.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {_number(self._sums[key])}")
+                samples.append(f"{self.name}_count{_label_text(self.labelnames, key)} {cumulative}")
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Itinerary stream stages
+SPRING_FETCH_SECONDS = registry.histogram("itinerary_spring_fetch_seconds", "Time to get the user's activities from the Spring API, cache included")
+ACTIVITY_COUNT = registry.histogram("itinerary_activity_count", "Activities selected per itinerary request", buckets=COUNT_BUCKETS)
+PROMPT_CHARS = registry.histogram("itinerary_prompt_chars", "Itinerary prompt size in characters", buckets=SIZE_BUCKETS)
+PROMPT_TOKENS = registry.histogram("itinerary_prompt_tokens", "Itinerary prompt size in tokens, counted with tiktoken (estimated at 4 characters per token without it)", buckets=SIZE_BUCKETS)
+TIME_TO_FIRST_TOKEN_SECONDS = registry.histogram("itinerary_llm_time_to_first_token_seconds", "Time from sending the itinerary prompt to the first streamed token")
+OUTPUT_TOKENS = registry.histogram("itinerary_llm_output_tokens", "Streamed chunks (about one token each) per itinerary generation", buckets=SIZE_BUCKETS)
+GENERATION_SECONDS = registry.histogram("itinerary_llm_generation_seconds", "Duration of one itinerary LLM generation")
+TIME_TO_FIRST_ITEM_SECONDS = registry.histogram("itinerary_time_to_first_item_seconds", "Time from the SSE request to its first itinerary item", ["source"])
+ITEM_GAP_SECONDS = registry.histogram("itinerary_item_gap_seconds", "Time between consecutive itinerary items on one SSE stream", ["source"])
+STREAM_SECONDS = registry.histogram("itinerary_stream_duration_seconds", "Duration of an SSE itinerary stream", ["source"])
+STREAM_ITEMS = registry.histogram("itinerary_stream_items", "Items sent per SSE itinerary stream", ["source"], buckets=COUNT_BUCKETS)
+STREAM_ERRORS = registry.counter("itinerary_stream_errors_total", "SSE itinerary streams that ended with an error event")
+SSE_RECONNECTS = registry.counter("itinerary_sse_reconnects_total", "SSE requests carrying Last-Event-ID, by whether the stream could be resumed", ["result"])
+
+BATCH_USERS = registry.counter("itinerary_batch_users_total", "Users processed by /batch-itinerary, by outcome", ["result"])
+
+# LLM gateway
+LLM_ACTIVE = registry.gauge("llm_active_calls", "LLM calls currently admitted by the gateway")
+LLM_QUEUED = registry.gauge("llm_queued_calls", "LLM calls waiting for admission")
+LLM_QUEUE_WAIT_SECONDS = registry.histogram("llm_queue_wait_seconds", "Time LLM calls waited for admission", ["priority"])
+LLM_REJECTED = registry.counter("llm_rejected_total", "LLM calls shed by the gateway", ["priority", "reason"])
+LLM_RETRIES = registry.counter("llm_retries_total", "LLM calls retried after a rate limit or transient error")
+
+# Background precomputation
+PRECOMPUTE_QUEUE_DEPTH = registry.gauge("precompute_queue_depth", "Users waiting for an itinerary precomputation, debouncing or queued")
+PRECOMPUTE_LATENCY_SECONDS = registry.histogram("precompute_latency_seconds", "Time from an activity change to its precomputed itinerary, debounce and queueing included")
+PRECOMPUTE_JOBS = registry.counter("precompute_jobs_total", "Itinerary precomputations by outcome", ["result"])
+
+# Recommendations
+RECOMMENDATION_SECONDS = registry.histogram("recommendation_duration_seconds", "Duration of /get-recommendations by the path that answered", ["source"])
+RECOMMENDATION_REQUESTS = registry.counter("recommendation_requests_total", "/get-recommendations requests by the path that answered", ["source"])
+
+
+# Caches report through their stats() dict, read at scrape time
+_caches = {}
+
+
+def register_cache(name, cache):
+    _caches[name] = cache
+
+
+def _cache_stat(field):
+    return lambda: {(name,): cache.stats().get(field, 0) for name, cache in _caches.items()}
+
+
+CACHE_HIT_RATIO = registry.gauge("cache_hit_ratio", "Share of cache lookups answered from the cache", ["cache"], _cache_stat("hit_ratio"))
+CACHE_SIZE = registry.gauge("cache_entries", "Entries currently held by the cache", ["cache"], _cache_stat("size"))
@@ -0,0 +1,58 @@
+from pydantic import ValidationError
+
+from models.ItineraryModels import ItineraryStreamItem
+
+
+class ItineraryLineParser:
+    """
+    Incremental parser for the newline-delimited JSON the itinerary prompt asks the model for.
+
+    Only the unterminated tail of the stream is buffered, so total work is linear in the response length,
+    and every object is emitted as soon as its newline arrives. `close()` flushes a final line the model
+    didn't terminate.
+
+    Malformed lines policy: blank lines and markdown fences are ignored silently. Any other line that isn't
+    a JSON object, or doesn't validate as an ItineraryStreamItem, is counted in `skipped` and logged, and
+    parsing carries on. With `strict=True` such lines raise ValueError instead.
+    """
+
+    def __init__(self, strict=False):
+        self.strict = strict
+        self._tail = []
+        self.parsed = 0
+        self.skipped = 0
+
+    def feed(self, chunk):
+        """Consumes a chunk of model output, returning the items completed by it."""
+        if "\n" not in chunk:
+            self._tail.append(chunk)
+            return []
+        head, _, rest = chunk.rpartition("\n")
+        self._tail.append(head)
+        lines = "".join(self._tail).split("\n")
+        self._tail = [rest] if rest else []
+        return [item for item in map(self._parse_line, lines) if item is not None]
+
+    def close(self):
+        """Flushes whatever is left once the stream has ended."""
+        line = "".join(self._tail)
+        self._tail = []
+        item = self._parse_line(line)
+        return [item] if item is not None else []
+
+    def _parse_line(self, line):
+        line = line.strip()
+        if not line or line.startswith("```"):
+            return None
+        try:
+            if not (line.startswith("{") and line.endswith("}")):
+                raise ValueError("not a JSON object")
+            item = ItineraryStreamItem.model_validate_json(line).model_dump(mode="json")
+        except (ValueError, ValidationError) as e:
+            self.skipped += 1
+            print(f"Skipping malformed itinerary line {line[:120]!r}: {e}")
+            if self.strict:
+                raise ValueError(f"Malformed itinerary line: {line[:120]!r}") from e
+            return None
+        self.parsed += 1
+        return item
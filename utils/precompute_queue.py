@@ -0,0 +1,145 @@
+import asyncio
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.metrics import PRECOMPUTE_JOBS, PRECOMPUTE_LATENCY_SECONDS, PRECOMPUTE_QUEUE_DEPTH
+
+PRECOMPUTE_WORKERS = int(os.getenv("PRECOMPUTE_WORKERS", "2"))
+# A change waits this long for further changes to the same user before it is computed
+PRECOMPUTE_DEBOUNCE_SECONDS = float(os.getenv("PRECOMPUTE_DEBOUNCE_SECONDS", "2"))
+# ...but never longer than this after the first change, so a user editing non-stop still gets precomputed
+PRECOMPUTE_MAX_DELAY_SECONDS = float(os.getenv("PRECOMPUTE_MAX_DELAY_SECONDS", "10"))
+PRECOMPUTE_MAX_PENDING = int(os.getenv("PRECOMPUTE_MAX_PENDING", "10000"))
+LATENCY_WINDOW = 512
+
+
+class PrecomputeQueue:
+    """
+    In-process queue of users whose itineraries should be computed ahead of their first request.
+    Changes to the same user are coalesced: each one pushes the job back by the debounce interval (up to the
+    maximum delay), a user is never queued twice, and a change that lands while the user's job is running
+    schedules one more run afterwards. A fixed pool of workers runs the jobs.
+    """
+
+    def __init__(self, job, workers=PRECOMPUTE_WORKERS, debounce_seconds=PRECOMPUTE_DEBOUNCE_SECONDS,
+                 max_delay_seconds=PRECOMPUTE_MAX_DELAY_SECONDS, max_pending=PRECOMPUTE_MAX_PENDING):
+        self.job = job
+        self.workers = workers
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+        self.max_pending = max_pending
+        self._timers = {}
+        self._changed_at = {}
+        self._ready = None
+        self._queued = set()
+        self._running = set()
+        self._rerun = set()
+        self._tasks = []
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self.enqueued = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        self._ready = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, user_id):
+        """Schedules a user's job, returns False when the queue is full."""
+        now = time.monotonic()
+        if user_id in self._running:
+            self._rerun.add(user_id)
+            self._changed_at.setdefault(user_id, now)
+            self.coalesced += 1
+            return True
+        if user_id in self._queued:
+            self.coalesced += 1
+            return True
+
+        timer = self._timers.pop(user_id, None)
+        if timer is not None:
+            timer.cancel()
+            self.coalesced += 1
+        elif self.depth() >= self.max_pending:
+            self.rejected += 1
+            return False
+        else:
+            self.enqueued += 1
+
+        changed_at = self._changed_at.setdefault(user_id, now)
+        delay = min(self.debounce_seconds, changed_at + self.max_delay_seconds - now)
+        self._timers[user_id] = asyncio.get_running_loop().call_later(max(delay, 0), self._release, user_id)
+        self._update_depth()
+        return True
+
+    def depth(self):
+        """Users waiting out their debounce or waiting for a worker."""
+        return len(self._timers) + len(self._queued)
+
+    def stats(self):
+        latencies = np.array(self._latencies) * 1000 if self._latencies else None
+        return {
+            "debouncing": len(self._timers),
+            "queued": len(self._queued),
+            "running": len(self._running),
+            "depth": self.depth(),
+            "workers": self.workers,
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "latency_ms": {
+                "p50": round(float(np.percentile(latencies, 50)), 2),
+                "p95": round(float(np.percentile(latencies, 95)), 2),
+                "max": round(float(latencies.max()), 2),
+            } if latencies is not None else None,
+        }
+
+    def _release(self, user_id):
+        self._timers.pop(user_id, None)
+        self._queued.add(user_id)
+        self._ready.put_nowait(user_id)
+        self._update_depth()
+
+    async def _work(self):
+        while True:
+            user_id = await self._ready.get()
+            self._queued.discard(user_id)
+            self._running.add(user_id)
+            changed_at = self._changed_at.pop(user_id, time.monotonic())
+            self._update_depth()
+            try:
+                await self.job(user_id)
+                self.completed += 1
+                PRECOMPUTE_JOBS.inc(result="complete")
+            except Exception as e:
+                print(f"precompute {user_id}: {e}")
+                self.failed += 1
+                PRECOMPUTE_JOBS.inc(result="error")
+            finally:
+                self._running.discard(user_id)
+            # Latency from the change to the itinerary being ready, debounce and queueing included
+            latency = time.monotonic() - changed_at
+            self._latencies.append(latency)
+            PRECOMPUTE_LATENCY_SECONDS.observe(latency)
+            if user_id in self._rerun:
+                self._rerun.discard(user_id)
+                self.enqueue(user_id)
+
+    def _update_depth(self):
+        PRECOMPUTE_QUEUE_DEPTH.set(self.depth())
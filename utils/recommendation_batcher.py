@@ -0,0 +1,102 @@
+import asyncio
+import os
+
+from langchain_core.messages import SystemMessage, HumanMessage
+
+from models.ActivityModels import CategoryList, CategoryListBatch
+
+RECOMMENDATION_BATCH_WINDOW_MS = float(os.getenv("RECOMMENDATION_BATCH_WINDOW_MS", "20"))
+RECOMMENDATION_BATCH_MAX_SIZE = int(os.getenv("RECOMMENDATION_BATCH_MAX_SIZE", "16"))
+
+RECOMMENDATION_SYSTEM_PROMPT = """
+        You are a helpful assistant that receives user descriptions about their desired trip experience.
+        Your task is to analyze these descriptions and infer the types of activity categories the user is most likely interested in.
+        You are allowed to infer loosely, and try to associate as many categories as you can.
+        """
+
+BATCH_INSTRUCTIONS = """
+        You will receive several numbered descriptions, each written by a different user.
+        Analyze every description independently and return exactly one category list per description, in the same order.
+        """
+
+
+class RecommendationBatcher:
+    """
+    Collects concurrent `/get-recommendations` descriptions for a short window (or until the batch is full)
+    and classifies them with a single structured-output call, fanning the category lists back out to each caller.
+    Calls go through the LLM gateway with interactive priority.
+    """
+
+    def __init__(self, gateway, model_kwargs, window_ms=RECOMMENDATION_BATCH_WINDOW_MS, max_batch_size=RECOMMENDATION_BATCH_MAX_SIZE):
+        self.gateway = gateway
+        self.model_kwargs = model_kwargs
+        self.window_seconds = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending = []
+        self._timer = None
+        self._single_model = None
+        self._batch_model = None
+        # The loop only keeps weak references to tasks, in-flight batches are held here until they finish
+        self._tasks = set()
+
+    async def classify(self, description):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((description, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _models(self):
+        if self._single_model is None:
+            model = self.gateway.model(**self.model_kwargs)
+            self._single_model = model.with_structured_output(schema=CategoryList)
+            self._batch_model = model.with_structured_output(schema=CategoryListBatch)
+        return self._single_model, self._batch_model
+
+    async def _classify_one(self, description):
+        single_model, _ = self._models()
+        return await self.gateway.invoke(single_model, [
+            SystemMessage(content=RECOMMENDATION_SYSTEM_PROMPT),
+            HumanMessage(content=description),
+        ])
+
+    async def _classify_many(self, descriptions):
+        _, batch_model = self._models()
+        numbered = "\n".join(f"{i+1}. {description}" for i, description in enumerate(descriptions))
+        result = await self.gateway.invoke(batch_model, [
+            SystemMessage(content=RECOMMENDATION_SYSTEM_PROMPT + BATCH_INSTRUCTIONS),
+            HumanMessage(content=numbered),
+        ])
+        if len(result.results) == len(descriptions):
+            return result.results
+        # The model lost track of the numbering, answer each description on its own instead
+        print(f"Batched recommendation returned {len(result.results)} results for {len(descriptions)} descriptions, retrying individually")
+        return await asyncio.gather(*(self._classify_one(description) for description in descriptions))
+
+    async def _run(self, batch):
+        descriptions = [description for description, _ in batch]
+        try:
+            if len(batch) == 1:
+                results = [await self._classify_one(descriptions[0])]
+            else:
+                results = await self._classify_many(descriptions)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from utils.category_classifier import NEGATION_CUES, STOP_WORDS
+
+RECOMMENDATION_CACHE_MAX_ENTRIES = int(os.getenv("RECOMMENDATION_CACHE_MAX_ENTRIES", "2048"))
+RECOMMENDATION_CACHE_TTL_SECONDS = float(os.getenv("RECOMMENDATION_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+RECOMMENDATION_CACHE_DB = os.getenv("RECOMMENDATION_CACHE_DB", "")
+
+# Estimated Jaccard similarity of shingle sets above which two descriptions share an answer
+NEAR_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 4
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20250715)
+_HASH_A = _rng.integers(1, _MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.int64)
+_HASH_B = _rng.integers(0, _MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.int64)
+
+_PUNCTUATION = re.compile(r"[^a-z0-9\s]+")
+
+
+def normalize_description(description):
+    """Lowercases, strips punctuation and stop words and collapses whitespace, so templated variants share a key."""
+    words = _PUNCTUATION.sub(" ", description.lower()).split()
+    return " ".join(word for word in words if word not in STOP_WORDS)
+
+
+def minhash_signature(normalized):
+    text = f" {normalized} "
+    shingles = {text[i:i + SHINGLE_SIZE] for i in range(max(len(text) - SHINGLE_SIZE + 1, 1))}
+    hashes = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles), dtype=np.int64, count=len(shingles))
+    hashes %= _MERSENNE_PRIME
+    return ((_HASH_A[:, None] * hashes[None, :] + _HASH_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+
+def _negations(key):
+    return frozenset(word for word in key.split() if word in NEGATION_CUES)
+
+
+def _bands(signature):
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+
+
+class RecommendationCache:
+    """
+    Cache of `/get-recommendations` answers keyed on the normalized description.
+    Exact keys are looked up first, then near-duplicates through MinHash signatures bucketed with LSH.
+    Near-duplicates must use the same negations, "nightlife with clubs" and "nightlife without clubs" differ in
+    one word but ask for opposite things.
+    Memory is bounded by LRU eviction, entries expire after a TTL, and an optional SQLite file keeps
+    the cache across worker restarts. Writes to it are batched into one transaction in a worker thread, off the
+    event loop.
+    """
+
+    def __init__(self, max_entries=RECOMMENDATION_CACHE_MAX_ENTRIES, ttl_seconds=RECOMMENDATION_CACHE_TTL_SECONDS, db_path=RECOMMENDATION_CACHE_DB):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._buckets = defaultdict(set)
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._db = None
+        self._writes = []
+        self._writer = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS recommendations (key TEXT PRIMARY KEY, categories TEXT NOT NULL, expires_at REAL NOT NULL)")
+            self._load()
+
+    def get(self, description):
+        """Cached category names for a description as (categories, tier), or None on a miss."""
+        key = normalize_description(description)
+        categories = self._lookup(key)
+        if categories is not None:
+            self.exact_hits += 1
+            return categories, "exact"
+
+        signature = minhash_signature(key)
+        candidates = set()
+        for band in _bands(signature):
+            candidates |= self._buckets.get(band, set())
+        negations = _negations(key)
+        best_key, best_similarity = None, NEAR_DUPLICATE_THRESHOLD
+        for candidate in candidates:
+            if _negations(candidate) != negations:
+                continue
+            similarity = float(np.mean(self._entries[candidate][2] == signature))
+            if similarity >= best_similarity:
+                best_key, best_similarity = candidate, similarity
+        if best_key is not None:
+            categories = self._lookup(best_key)
+            if categories is not None:
+                self.near_hits += 1
+                return categories, "near"
+
+        self.misses += 1
+        return None
+
+    def put(self, description, categories):
+        key = normalize_description(description)
+        expires_at = time.time() + self.ttl_seconds
+        self._insert(key, list(categories), expires_at)
+        self._persist("INSERT OR REPLACE INTO recommendations VALUES (?, ?, ?)", (key, json.dumps(categories), expires_at))
+
+    def stats(self):
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+        }
+
+    async def flush(self):
+        """Waits for the pending SQLite writes."""
+        if self._writer is not None:
+            await self._writer
+
+    def close(self):
+        if self._db is not None:
+            self._write(self._writes)
+            self._writes = []
+            self._db.close()
+            self._db = None
+
+    def _persist(self, statement, parameters):
+        if self._db is None:
+            return
+        self._writes.append((statement, parameters))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Outside the event loop (loading at startup), there is nothing to stall
+            self._write(self._writes)
+            self._writes = []
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._write_behind())
+
+    async def _write_behind(self):
+        while self._writes:
+            writes, self._writes = self._writes, []
+            try:
+                await asyncio.to_thread(self._write, writes)
+            except sqlite3.Error as e:
+                print(f"Recommendation cache write failed: {e}")
+
+    def _write(self, writes):
+        if not writes:
+            return
+        # One transaction, so a batch costs a single sync to disk
+        self._db.execute("BEGIN")
+        try:
+            for statement, parameters in writes:
+                self._db.execute(statement, parameters)
+        except sqlite3.Error:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        categories, expires_at, _ = entry
+        if expires_at <= time.time():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return categories
+
+    def _insert(self, key, categories, expires_at):
+        if key in self._entries:
+            self._remove(key, persist=False)
+        signature = minhash_signature(key)
+        self._entries[key] = (categories, expires_at, signature)
+        for band in _bands(signature):
+            self._buckets[band].add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key, persist=True):
+        _, _, signature = self._entries.pop(key)
+        for band in _bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+        if persist:
+            self._persist("DELETE FROM recommendations WHERE key = ?", (key,))
+
+    def _load(self):
+        self._db.execute("DELETE FROM recommendations WHERE expires_at <= ?", (time.time(),))
+        rows = self._db.execute(
+            "SELECT key, categories, expires_at FROM recommendations ORDER BY expires_at DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for key, categories, expires_at in reversed(rows):
+            self._insert(key, json.loads(categories), expires_at)
@@ -0,0 +1,235 @@
+import re
+import numpy as np
+from datetime import datetime, timedelta
+
+from models.ItineraryModels import ItineraryStreamItem
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Planning assumptions, mirroring the rules given to the LLM in the itinerary prompt
+TRIP_START = datetime(2025, 7, 15, 8, 0)
+DAY_START_HOUR = 8
+DAY_END_MINUTES = 23 * 60 + 59
+MAX_ACTIVITIES_PER_DAY = 5
+
+# Commute model: average door-to-door city speed, rounded up to 5 minute slots
+AVERAGE_SPEED_KMPH = 25.0
+MIN_COMMUTE_MINUTES = 10
+SAME_PLACE_KM = 0.05
+
+# A rest slot is inserted once this much activity time has piled up without a break
+REST_AFTER_MINUTES = 240
+REST_MINUTES = 30
+
+DEFAULT_DURATION_MINUTES = 60
+# Matched against whole words, so "raft" doesn't hit "handicrafts" nor "surf" a place called "Surfside"
+ADVENTURE_KEYWORDS = frozenset("""
+trek treks trekking hike hikes hiking raft rafting climb climbs climbing bungee zipline ziplining safari safaris kayak
+kayaking diving scuba camping adventure adventures adventurous ski skiing surf surfing cycling
+""".split())
+# Word prefixes, for words with too many forms to list
+ADVENTURE_STEMS = ("paraglid",)
+ADVENTURE_PHRASES = ("zip line",)
+
+_EPS = 1e-9
+_WORD_PATTERN = re.compile(r"[a-z]+")
+
+
+def haversine_cross(latitudes, longitudes, other_latitudes, other_longitudes):
+    """NxM great-circle distances in km between two sets of points, computed in one vectorized pass."""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    other_lat = np.radians(np.asarray(other_latitudes, dtype=float))
+    other_lon = np.radians(np.asarray(other_longitudes, dtype=float))
+    dlat = lat[:, None] - other_lat[None, :]
+    dlon = lon[:, None] - other_lon[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(other_lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matrix(latitudes, longitudes):
+    """NxN great-circle distances in km."""
+    return haversine_cross(latitudes, longitudes, latitudes, longitudes)
+
+
+def travel_minutes(distance_km):
+    """Estimated commute time for a distance (scalar or array), in whole minutes."""
+    distance_km = np.asarray(distance_km, dtype=float)
+    minutes = np.ceil(distance_km / AVERAGE_SPEED_KMPH * 60 / 5) * 5
+    minutes = np.maximum(minutes, MIN_COMMUTE_MINUTES)
+    return np.where(distance_km < SAME_PLACE_KM, 0, minutes).astype(int)
+
+
+def activity_distance_matrix(activity_list):
+    return haversine_matrix(
+        [float(activity['latitude']) for activity in activity_list],
+        [float(activity['longitude']) for activity in activity_list],
+    )
+
+
+def duration_minutes(activity):
+    try:
+        return max(int(round(float(activity['duration']))), 0)
+    except (KeyError, TypeError, ValueError):
+        return DEFAULT_DURATION_MINUTES
+
+
+def activity_type(activity):
+    words = _WORD_PATTERN.findall(f"{activity.get('name', '')} {activity.get('description', '')}".lower())
+    text = f" {' '.join(words)} "
+    if (any(word in ADVENTURE_KEYWORDS or word.startswith(ADVENTURE_STEMS) for word in words)
+            or any(f" {phrase} " in text for phrase in ADVENTURE_PHRASES)):
+        return "adventure"
+    return "tourist attraction"
+
+
+def _nearest_neighbour(dist, start):
+    n = len(dist)
+    visited = np.zeros(n, dtype=bool)
+    tour = [start]
+    visited[start] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.inf, dist[tour[-1]])
+        nxt = int(np.argmin(row))
+        tour.append(nxt)
+        visited[nxt] = True
+    return np.array(tour)
+
+
+def _two_opt(dist, tour, max_passes):
+    m = len(tour)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, m - 1):
+            j = np.arange(i + 1, m)
+            a, b = tour[i - 1], tour[i]
+            c, d = tour[j], tour[(j + 1) % m]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            k = int(np.argmin(delta))
+            if delta[k] < -_EPS:
+                tour[i:j[k] + 1] = tour[i:j[k] + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return tour
+
+
+def _or_opt(dist, tour, max_passes, max_segment=3):
+    for _ in range(max_passes):
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length <= len(tour) and len(tour) - length >= 2:
+                segment = tour[i:i + length]
+                first, last = segment[0], segment[-1]
+                prev, nxt = tour[i - 1], tour[(i + length) % len(tour)]
+                gain = dist[prev, first] + dist[last, nxt] - dist[prev, nxt]
+
+                rest = np.concatenate([tour[:i], tour[i + length:]])
+                after = np.concatenate([rest[1:], rest[:1]])
+                base = dist[rest, after]
+                forward = dist[rest, first] + dist[last, after] - base
+                backward = dist[rest, last] + dist[first, after] - base
+                k_fwd, k_bwd = int(np.argmin(forward)), int(np.argmin(backward))
+                reverse = backward[k_bwd] < forward[k_fwd]
+                k = k_bwd if reverse else k_fwd
+                if min(forward[k_fwd], backward[k_bwd]) < gain - _EPS:
+                    moved = segment[::-1] if reverse else segment
+                    tour = np.concatenate([rest[:k + 1], moved, rest[k + 1:]])
+                    improved = True
+                i += 1
+        if not improved:
+            break
+    return tour
+
+
+def solve_route(dist, max_passes=50):
+    """
+    Shortest open visiting order over a distance matrix.
+    Nearest-neighbour construction followed by 2-opt and Or-opt, run on the matrix extended with a
+    zero-cost dummy node so the closed-tour moves also optimize the open path's endpoints.
+    """
+    n = len(dist)
+    if n <= 2:
+        return list(range(n))
+
+    extended = np.zeros((n + 1, n + 1))
+    extended[1:, 1:] = dist
+    # Start from the most remote activity so the path sweeps across the area instead of doubling back
+    start = int(np.argmax(dist.sum(axis=1)))
+    tour = np.concatenate([[0], _nearest_neighbour(dist, start) + 1])
+
+    tour = _two_opt(extended, tour, max_passes)
+    tour = _or_opt(extended, tour, max_passes)
+    tour = np.roll(tour, -int(np.where(tour == 0)[0][0]))
+    return [int(node) - 1 for node in tour[1:]]
+
+
+def plan_route(activity_list):
+    """Visiting order (indices into activity_list) that minimizes total travel distance."""
+    if not activity_list:
+        return []
+    return solve_route(activity_distance_matrix(activity_list))
+
+
+def split_into_days(activity_list, order, dist=None):
+    """
+    Packs an ordered route into days, respecting the day window and the activities-per-day limit.
+    Returns a list of days, each a list of activity indices.
+    """
+    if dist is None:
+        dist = activity_distance_matrix(activity_list)
+    commute = travel_minutes(dist)
+
+    days = [[]]
+    clock = DAY_START_HOUR * 60
+    for index in order:
+        day = days[-1]
+        arrival = clock + (int(commute[day[-1], index]) if day else 0)
+        fits = arrival + duration_minutes(activity_list[index]) <= DAY_END_MINUTES
+        if day and (len(day) >= MAX_ACTIVITIES_PER_DAY or not fits):
+            days.append([])
+            day = days[-1]
+            arrival = DAY_START_HOUR * 60
+        day.append(index)
+        clock = arrival + duration_minutes(activity_list[index])
+    return days if days[0] else []
+
+
+def build_local_itinerary(activity_list, trip_start=TRIP_START):
+    """
+    Plans the complete itinerary in-process, without calling the LLM.
+    Activities are ordered by the route solver and packed into days, with the commute time left free between them.
+    Only the activities are returned: the commute and rest rows come from GapFiller, the same as for the LLM.
+    """
+    if not activity_list:
+        return []
+
+    dist = activity_distance_matrix(activity_list)
+    order = solve_route(dist)
+    commute = travel_minutes(dist)
+
+    items = []
+    for day_number, day in enumerate(split_into_days(activity_list, order, dist)):
+        clock = trip_start + timedelta(days=day_number)
+        for position, index in enumerate(day):
+            activity = activity_list[index]
+            if position > 0:
+                clock += timedelta(minutes=int(commute[day[position - 1], index]))
+            duration = duration_minutes(activity)
+            items.append(ItineraryStreamItem(
+                activity_name=activity['name'],
+                activity_type=activity_type(activity),
+                start_time=clock,
+                end_time=clock + timedelta(minutes=duration),
+                activity_id=str(activity['id']),
+            ))
+            clock += timedelta(minutes=duration)
+    return items
+
+
+def format_route_hint(activity_list, order, labels=None):
+    """Precomputed visiting order, phrased for the LLM prompt with the activity ids or the given per-activity labels."""
+    if labels is None:
+        labels = [activity['id'] for activity in activity_list]
+    return " -> ".join(str(labels[index]) for index in order)
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+
+import httpx
+
+SPRING_TIMEOUT = httpx.Timeout(connect=3.0, read=10.0, write=5.0, pool=5.0)
+SPRING_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+
+ACTIVITY_CACHE_TTL_SECONDS = float(os.getenv("ACTIVITY_CACHE_TTL_SECONDS", "30"))
+ACTIVITY_CACHE_MAX_USERS = int(os.getenv("ACTIVITY_CACHE_MAX_USERS", "1024"))
+
+_client = None
+
+
+async def start_client(transport=None):
+    """Opens the shared, pooled client for the Spring API. Called from the app lifespan."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=os.getenv('SPRING_API_URL', ''),
+            timeout=SPRING_TIMEOUT,
+            limits=SPRING_LIMITS,
+            transport=transport,
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def get_client():
+    return _client if _client is not None else await start_client()
+
+
+class _CacheEntry:
+    __slots__ = ("activities", "etag", "expires_at")
+
+    def __init__(self, activities, etag, expires_at):
+        self.activities = activities
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class ActivityCache:
+    """
+    Per-user cache of the Spring `/activities` response.
+    Entries expire after a TTL and are revalidated with If-None-Match, the least recently used user is evicted
+    once the cache is full, and concurrent misses for the same user share a single upstream request.
+    """
+
+    def __init__(self, ttl_seconds=ACTIVITY_CACHE_TTL_SECONDS, max_users=ACTIVITY_CACHE_MAX_USERS):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.coalesced = 0
+
+    async def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry.activities
+
+        self.misses += 1
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load(user_id, entry))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda done: self._finish(user_id, done))
+        else:
+            self.coalesced += 1
+        # Shielded so a disconnecting caller doesn't cancel the fetch other callers are waiting on
+        return await asyncio.shield(task)
+
+    def invalidate(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "coalesced": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _finish(self, user_id, task):
+        if self._inflight.get(user_id) is task:
+            del self._inflight[user_id]
+        if not task.cancelled():
+            task.exception()
+
+    async def _load(self, user_id, entry):
+        headers = {"If-None-Match": entry.etag} if entry is not None and entry.etag else {}
+        try:
+            client = await get_client()
+            response = await client.get("/activities", params={"userId": user_id}, headers=headers)
+        except httpx.HTTPError as e:
+            raise Exception("Internal server error, unable to relay data to LLM") from e
+
+        if response.status_code == 304 and entry is not None:
+            self.revalidated += 1
+            self._store(user_id, entry.activities, entry.etag)
+            return entry.activities
+        if response.status_code != 200:
+            raise Exception("Internal server error, unable to relay data to LLM")
+
+        activities = response.json()["data"]
+        self._store(user_id, activities, response.headers.get("ETag"))
+        return activities
+
+    def _store(self, user_id, activities, etag):
+        self._entries[user_id] = _CacheEntry(activities, etag, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+
+activity_cache = ActivityCache()
+
+
+async def fetch_activities(user_id):
+    return await activity_cache.get(user_id)
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import os
+import uuid
+from collections import deque
+
+SSE_REPLAY_BUFFER_EVENTS = int(os.getenv("SSE_REPLAY_BUFFER_EVENTS", "512"))
+SSE_RESUME_GRACE_SECONDS = float(os.getenv("SSE_RESUME_GRACE_SECONDS", "60"))
+
+
+class StreamGap(Exception):
+    """A subscriber asked for events that have already left the replay buffer."""
+
+
+class StreamSession:
+    """
+    One SSE stream, decoupled from the connection that started it.
+    The producer's events run in their own task and are numbered and kept in a bounded ring buffer, so a client
+    that reconnects with Last-Event-ID gets only what it missed and then follows the live stream.
+    Once the last subscriber leaves, the session lives on for the grace period before it is cancelled and dropped.
+    """
+
+    def __init__(self, key, owner, producer, on_expire, buffer_size=SSE_REPLAY_BUFFER_EVENTS, grace_seconds=SSE_RESUME_GRACE_SECONDS):
+        self.key = key
+        self.owner = owner
+        self.events = deque(maxlen=buffer_size)
+        self.sequence = 0
+        self.done = False
+        self.subscribers = 0
+        self.grace_seconds = grace_seconds
+        self._on_expire = on_expire
+        self._expiry = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run(producer))
+
+    async def _run(self, producer):
+        try:
+            async for event in producer:
+                self.sequence += 1
+                self.events.append((self.sequence, f"id: {self.key}:{self.sequence}\ndata: {json.dumps(event)}\n\n"))
+                self._notify()
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def covers(self, after):
+        """Whether every event after sequence number `after` is still in the buffer."""
+        oldest = self.events[0][0] if self.events else self.sequence + 1
+        return after + 1 >= oldest
+
+    async def subscribe(self, after=0):
+        """Yields the formatted events after sequence number `after`, replayed from the buffer and then live."""
+        self._attach()
+        try:
+            while True:
+                if not self.covers(after):
+                    raise StreamGap(f"events after {self.key}:{after} are no longer buffered")
+                for sequence, event in list(self.events):
+                    if sequence > after:
+                        yield event
+                        after = sequence
+                if self.done:
+                    return
+                await self._changed.wait()
+        finally:
+            self._detach()
+
+    def _attach(self):
+        self.subscribers += 1
+        if self._expiry is not None:
+            self._expiry.cancel()
+            self._expiry = None
+
+    def _detach(self):
+        self.subscribers -= 1
+        if self.subscribers == 0:
+            self._expiry = asyncio.get_running_loop().call_later(self.grace_seconds, self._expire)
+
+    def _expire(self):
+        self._expiry = None
+        if self.subscribers == 0:
+            self.task.cancel()
+            self._on_expire(self)
+
+
+class StreamSessions:
+    """Live SSE sessions by key, the first half of every event id (`<key>:<sequence>`)."""
+
+    def __init__(self, buffer_size=SSE_REPLAY_BUFFER_EVENTS, grace_seconds=SSE_RESUME_GRACE_SECONDS):
+        self.buffer_size = buffer_size
+        self.grace_seconds = grace_seconds
+        self._sessions = {}
+        self.started = 0
+        self.resumed = 0
+        self.resume_failures = 0
+
+    def start(self, owner, producer):
+        session = StreamSession(uuid.uuid4().hex, owner, producer, self._drop, self.buffer_size, self.grace_seconds)
+        self._sessions[session.key] = session
+        self.started += 1
+        return session
+
+    def resume(self, owner, last_event_id):
+        """The session and sequence number to continue from for a Last-Event-ID, or None to start over."""
+        key, _, sequence = (last_event_id or "").partition(":")
+        session = self._sessions.get(key)
+        if session is None or session.owner != owner or not sequence.isdigit() or not session.covers(int(sequence)):
+            self.resume_failures += 1
+            return None
+        self.resumed += 1
+        return session, int(sequence)
+
+    def stats(self):
+        return {
+            "active": len(self._sessions),
+            "started": self.started,
+            "resumed": self.resumed,
+            "resume_failures": self.resume_failures,
+        }
+
+    def _drop(self, session):
+        if self._sessions.get(session.key) is session:
+            del self._sessions[session.key]
@@ -0,0 +1,61 @@
+import math
+import os
+import threading
+
+import tiktoken
+
+# gpt-4.1's encoding, set TIKTOKEN_CACHE_DIR to ship it with the deployment instead of downloading it at startup
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "o200k_base")
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+
+
+def load_tokenizer():
+    """
+    Loads the encoding, which downloads it unless TIKTOKEN_CACHE_DIR already has it, requests never load it
+    themselves. Until a load succeeds token counts are estimated, and a failed load isn't remembered, so calling
+    this again retries it.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            print(f"Tokenizer {TOKENIZER_ENCODING} unavailable, estimating {CHARS_PER_TOKEN} characters per token: {e}")
+    return _encoding is not None
+
+
+def load_tokenizer_in_background():
+    """
+    Starts load_tokenizer in a daemon thread, called from the app lifespan. The download has no timeout, so
+    neither startup nor shutdown waits for it.
+    """
+    threading.Thread(target=load_tokenizer, name="tokenizer-load", daemon=True).start()
+
+
+def tokenizer_name():
+    return TOKENIZER_ENCODING if _encoding is not None else "estimate"
+
+
+def count_tokens(text):
+    if _encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text, max_tokens):
+    """Text cut to at most max_tokens tokens, ending in an ellipsis when anything was cut."""
+    if max_tokens <= 0:
+        return ""
+    if _encoding is None:
+        limit = max_tokens * CHARS_PER_TOKEN
+        if len(text) <= limit:
+            return text
+        # Cut on a word boundary where there is one
+        cut = text[:limit].rsplit(" ", 1)[0] or text[:limit]
+        return cut.rstrip(" ,.;:") + "…"
+    tokens = _encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return _encoding.decode(tokens[:max_tokens - 1]).rstrip(" ,.;:") + "…"